@@ -0,0 +1,77 @@
+"""
+The purpose of this file is to measure what one tick costs to broadcast as the number of clients grows.
+
+Compares:
+1) per-client: the old approach, every connection runs json.dumps(..., indent=4) on the same snapshot
+2) encode-once: broadcast.Tick encodes one compact message that every connection is handed
+
+Clients are fake sockets that only count bytes, so the numbers are serialization + fan-out cost, not network.
+
+Run from backend/:
+python benchmarks/bench_broadcast.py
+"""
+
+# Imports
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+from api import asset_registry  # noqa: E402
+from broadcast import Tick  # noqa: E402
+from encoding import JSON_BACKEND  # noqa: E402
+from synthetic import SyntheticMarket  # noqa: E402
+
+CLIENT_COUNTS = (1, 10, 100, 1_000)
+TICKS = 5
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.bytes_sent = 0
+
+    async def send_text(self, text):
+        self.bytes_sent += len(text.encode())
+
+
+async def per_client(sockets, snapshot):
+    async def send(websocket):
+        response_data = {"channel": "rates", "event": "data", "vs_currency": "cad", "data": snapshot}
+        await websocket.send_text(json.dumps(response_data, indent=4))
+
+    await asyncio.gather(*(send(websocket) for websocket in sockets))
+
+
+async def encode_once(sockets, snapshot):
+    tick = Tick("cad", snapshot)
+    tick.message()  # The producer encodes before fanning out
+
+    async def send(websocket):
+        await websocket.send_text(tick.message())
+
+    await asyncio.gather(*(send(websocket) for websocket in sockets))
+
+
+async def main():
+    market = SyntheticMarket(asset_registry.current().prices, seed=1)
+    snapshot = market.snapshot().ranked_by_bid().to_records(suffix="_CAD")
+
+    print(f"JSON backend: {JSON_BACKEND}, {len(snapshot)} assets per snapshot")
+    print(f"{'clients':>8} {'per-client ms':>14} {'encode-once ms':>15} {'bytes/msg before':>17} {'after':>8}")
+    for clients in CLIENT_COUNTS:
+        results = []
+        for broadcast in (per_client, encode_once):
+            sockets = [FakeWebSocket() for _ in range(clients)]
+            start = time.perf_counter()
+            for _ in range(TICKS):
+                await broadcast(sockets, snapshot)
+            elapsed = (time.perf_counter() - start) / TICKS * 1000
+            results.append((elapsed, sockets[0].bytes_sent // TICKS))
+        (before_ms, before_bytes), (after_ms, after_bytes) = results
+        print(f"{clients:>8} {before_ms:>14.2f} {after_ms:>15.2f} {before_bytes:>17} {after_bytes:>8}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,89 @@
+"""
+The purpose of this file is to measure what compression saves and costs on the rates channel so production settings
+can be chosen with numbers.
+
+A seeded synthetic market produces a stream of ticks (one snapshot, then deltas) encoded exactly as the hub sends them.
+Each message is compressed the way permessage-deflate does it (raw deflate + sync flush) for several levels, with and
+without context takeover. permessage-deflate runs once per connection, so CPU per tick grows with client count.
+The last section does the same for a gzip'd HTTP snapshot.
+
+Run from backend/:
+python benchmarks/bench_compression.py
+"""
+
+# Imports
+import asyncio
+import gzip
+import sys
+import time
+import zlib
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+from api import asset_registry  # noqa: E402
+from broadcast import BroadcastHub  # noqa: E402
+from synthetic import SyntheticMarket  # noqa: E402
+
+TICKS = 200
+LEVELS = (1, 6, 9)
+CLIENT_COUNTS = (100, 1_000, 10_000)
+
+
+def tick_stream(mode):
+    """
+    Encoded messages for TICKS ticks, as a client subscribed in mode receives them
+    """
+    market = SyntheticMarket(asset_registry.current().prices, seed=1, tick_seconds=10)
+    hub = BroadcastHub()
+    queue = asyncio.Queue()
+    hub.subscribe(queue, "cad")
+
+    messages = []
+    for _ in range(TICKS):
+        market.step()
+        # Round like CoinGecko prices so deltas only carry symbols that visibly moved
+        snapshot = market.snapshot().ranked_by_bid().scaled(1, decimals=2)
+        hub.publish("cad", snapshot.to_records(suffix="_CAD"))
+        while not queue.empty():
+            messages.append(queue.get_nowait().message(mode).encode())
+    return messages
+
+
+def deflate_stream(messages, level, context_takeover):
+    """
+    Returns (compressed bytes, seconds) for compressing messages like permessage-deflate would
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    total = 0
+    start = time.perf_counter()
+    for message in messages:
+        if not context_takeover:
+            compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+        total += len(compressor.compress(message) + compressor.flush(zlib.Z_SYNC_FLUSH)) - 4
+    return total, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    for mode in ("snapshot", "delta"):
+        messages = tick_stream(mode)
+        raw = sum(len(message) for message in messages)
+        print(f"\n{mode} messages: {len(messages)}, {raw / len(messages):,.0f} bytes per message uncompressed")
+        header = f"{'level':>5} {'takeover':>9} {'bytes/msg':>10} {'saved':>7} {'us/msg':>8}"
+        header += "".join(f" {f'ms/tick @{c}':>15}" for c in CLIENT_COUNTS)
+        print(header)
+        for level in LEVELS:
+            for context_takeover in (True, False):
+                compressed, seconds = deflate_stream(messages, level, context_takeover)
+                per_message_us = seconds / len(messages) * 1e6
+                row = f"{level:>5} {str(context_takeover):>9} {compressed / len(messages):>10,.0f}"
+                row += f" {1 - compressed / raw:>7.1%} {per_message_us:>8.1f}"
+                row += "".join(f" {per_message_us * c / 1000:>15.1f}" for c in CLIENT_COUNTS)
+                print(row)
+
+    snapshot = tick_stream("snapshot")[-1]
+    print(f"\nHTTP gzip of one snapshot ({len(snapshot):,} bytes)")
+    for level in LEVELS:
+        start = time.perf_counter()
+        for _ in range(100):
+            body = gzip.compress(snapshot, compresslevel=level)
+        print(f"level {level}: {len(body):,} bytes, {(time.perf_counter() - start) * 10:.2f}ms per response")
@@ -0,0 +1,90 @@
+"""
+The purpose of this file is to show that an upstream fetch no longer freezes the event loop.
+
+A local HTTP server stands in for CoinGecko and answers after a fixed delay. While one fetch is in flight, a ticker
+coroutine measures how late each 10ms sleep wakes up (event-loop lag). We compare:
+
+1) blocking: the old approach, requests.get called directly inside a coroutine
+2) async: api.fetch_crypto_data on the shared pooled httpx.AsyncClient
+
+Run from backend/:
+python benchmarks/bench_event_loop_lag.py
+"""
+
+# Imports
+import asyncio
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import requests
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+import api  # noqa: E402
+
+UPSTREAM_DELAY = 0.5  # Seconds the fake CoinGecko takes to answer
+TICK = 0.01  # Seconds between lag samples
+
+
+class SlowHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        time.sleep(UPSTREAM_DELAY)
+        body = b"[]"
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass  # Keep the benchmark output readable
+
+
+async def measure_lag(fetch):
+    """
+    Runs fetch once while sampling event-loop lag, returns (max lag, mean lag) in ms
+    """
+    lags = []
+    done = asyncio.Event()
+
+    async def ticker():
+        while not done.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(TICK)
+            lags.append((time.perf_counter() - start - TICK) * 1000)
+
+    ticker_task = asyncio.create_task(ticker())
+    await asyncio.sleep(TICK * 3)  # Let the ticker settle before the fetch starts
+    await fetch()
+    done.set()
+    await ticker_task
+    return max(lags), sum(lags) / len(lags)
+
+
+async def main():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SlowHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/api/v3/coins/markets"
+    api.COINGECKO_URL = url
+
+    async def blocking_fetch():
+        requests.get(url, params={"vs_currency": "cad"}).json()
+
+    async def async_fetch():
+        await api.fetch_crypto_data("cad")
+
+    await async_fetch()  # Warm up the pooled connection so both runs are comparable
+
+    print(f"Upstream delay: {UPSTREAM_DELAY * 1000:.0f}ms, lag sampled every {TICK * 1000:.0f}ms")
+    for name, fetch in (("blocking requests.get", blocking_fetch), ("async httpx", async_fetch)):
+        max_lag, mean_lag = await measure_lag(fetch)
+        print(f"{name:<22} max lag {max_lag:8.1f}ms   mean lag {mean_lag:6.1f}ms")
+
+    await api.close_client()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,231 @@
+"""
+The purpose of this file is to measure how the crypto_listings/markets/ws endpoint holds up with thousands of
+subscribers, fully offline.
+
+By default it starts mock_coingecko.py and the app (pointed at the mock through COINGECKO_URL, polling every
+--poll-seconds), then opens --clients WebSocket connections, sends each the "subscribe" event and listens for
+--duration seconds. It reports:
+
+1) tick -> client latency p50/p95/p99/max: from the moment the mock served a tick to the app until a client received
+it (the mock stamps the tick number into BTC's "change", see mock_coingecko.py)
+2) connections that failed or were dropped before the end of the run
+3) the app's resident memory (RSS) at start, peak and end
+
+Clients all run in this one process, which also has to parse every message. Past a few thousand clients the harness
+itself becomes the bottleneck; compare runs with the same --clients only.
+
+Run from backend/:
+python benchmarks/bench_load.py --clients 1000 --duration 30
+python benchmarks/bench_load.py --no-spawn --url ws://127.0.0.1:8000/crypto_listings/markets/ws --server-pid 1234
+"""
+
+# Imports
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+
+import websockets
+
+try:
+    import psutil  # Optional, /proc is read directly on Linux
+except ImportError:
+    psutil = None
+
+BACKEND = Path(__file__).resolve().parent.parent
+MARKER = "BTC_CAD"
+
+
+def rss_mib(pid):
+    """
+    Resident memory of pid in MiB, None if it cannot be read on this platform
+    """
+    if psutil is not None:
+        try:
+            return psutil.Process(pid).memory_info().rss / 2**20
+        except psutil.Error:
+            return None
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+
+def percentile(values, fraction):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def wait_for(url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(url, timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+def spawn(args, data_dir):
+    """
+    Starts the mock and the app, returns (processes, app pid)
+    """
+    mock = subprocess.Popen(
+        [
+            sys.executable,
+            str(BACKEND / "benchmarks" / "mock_coingecko.py"),
+            "--port", str(args.mock_port),
+            "--coins", str(args.coins),
+            "--tick-seconds", str(args.tick_seconds),
+        ]
+    )
+    wait_for(f"http://127.0.0.1:{args.mock_port}/mock/ticks")
+
+    env = {
+        **os.environ,
+        "COINGECKO_URL": f"http://127.0.0.1:{args.mock_port}/api/v3/coins/markets",
+        "MARKET_DATA_SOURCE": "coingecko",
+        "CoinGecko_Calls_Per_Minute": "6000",  # The mock has no quota
+        "POLL_INTERVAL": str(args.poll_seconds),
+        "TICK_STORE_DIR": str(Path(data_dir) / "ticks"),
+        "CANDLE_STORE_DIR": str(Path(data_dir) / "candles"),
+        "FX_RATES_FILE": str(Path(data_dir) / "fx_rates.json"),
+    }
+    app = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "app:app",
+            "--app-dir", str(BACKEND / "src"),
+            "--port", str(args.port),
+            "--log-level", "warning",
+        ],
+        env=env,
+        cwd=str(BACKEND / "src"),
+        stdout=subprocess.DEVNULL,  # The app prints a line per (un)subscription
+    )
+    wait_for(f"http://127.0.0.1:{args.port}/crypto_listings/fx")
+    return [app, mock], app.pid
+
+
+class Results:
+    def __init__(self):
+        self.received = {}  # tick : [(receipt epoch seconds, epoch seconds the client subscribed)]
+        self.messages = 0
+        self.connected = 0
+        self.failed = 0
+        self.dropped = 0
+
+
+async def client(url, results, stop, connect_limit):
+    try:
+        async with connect_limit:
+            ws = await websockets.connect(url, max_size=None, open_timeout=30)
+        results.connected += 1
+    except (OSError, asyncio.TimeoutError, websockets.WebSocketException):
+        results.failed += 1
+        return
+
+    try:
+        await ws.send(json.dumps({"event": "subscribe", "channel": "rates", "vs_currency": "cad"}))
+        subscribed_at = time.time()
+        while not stop.is_set():
+            try:
+                message = await asyncio.wait_for(ws.recv(), timeout=1)
+            except asyncio.TimeoutError:
+                continue
+            received_at = time.time()
+            results.messages += 1
+            rows = json.loads(message).get("data") or ()
+            for row in rows:
+                if row.get("symbol") == MARKER:
+                    results.received.setdefault(int(row["change"]), []).append((received_at, subscribed_at))
+                    break
+    except websockets.ConnectionClosed:
+        if not stop.is_set():
+            results.dropped += 1
+    finally:
+        await ws.close()
+
+
+async def run(args, pid):
+    results, stop = Results(), asyncio.Event()
+    connect_limit = asyncio.Semaphore(200)  # Stay under the listen backlog while connecting
+    rss = [rss_mib(pid)] if pid else []
+
+    tasks = [asyncio.create_task(client(args.url, results, stop, connect_limit)) for _ in range(args.clients)]
+    started = time.monotonic()
+    while time.monotonic() - started < args.duration:
+        await asyncio.sleep(1)
+        if pid:
+            rss.append(rss_mib(pid))
+        elapsed = time.monotonic() - started
+        print(f"\r{elapsed:5.0f}s {results.connected:,} connected, {results.messages:,} messages", end="")
+    stop.set()
+    await asyncio.gather(*tasks)
+    print()
+    return results, [r for r in rss if r is not None]
+
+
+def report(args, results, rss):
+    with urllib.request.urlopen(f"{args.mock_url}/mock/ticks", timeout=5) as response:
+        served = {int(tick): at for tick, at in json.load(response)["served"].items()}
+
+    # Only ticks served after the client subscribed, the snapshot sent on subscribe is older by design
+    latencies = [
+        (received_at - served[tick]) * 1000
+        for tick, receipts in results.received.items()
+        if tick in served
+        for received_at, subscribed_at in receipts
+        if served[tick] >= subscribed_at
+    ]
+    print(f"\nclients: {args.clients:,} requested, {results.connected:,} connected, {results.failed:,} failed")
+    print(f"dropped before the end: {results.dropped:,}")
+    print(f"messages: {results.messages:,}, {len(latencies):,} timed across {len(results.received):,} ticks")
+    print("tick -> client latency (ms): " + ", ".join(
+        f"{name} {percentile(latencies, fraction):,.1f}"
+        for name, fraction in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99), ("max", 1.0))
+    ))
+    if rss:
+        print(f"server RSS (MiB): start {rss[0]:,.1f}, peak {max(rss):,.1f}, end {rss[-1]:,.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="WebSocket load test against an offline mock CoinGecko")
+    parser.add_argument("--clients", type=int, default=1_000)
+    parser.add_argument("--duration", type=float, default=30, help="seconds to listen for")
+    parser.add_argument("--coins", type=int, default=1_000, help="mock payload size")
+    parser.add_argument("--tick-seconds", type=float, default=1.0, help="seconds between mock price updates")
+    parser.add_argument("--poll-seconds", type=float, default=1.0, help="POLL_INTERVAL of the spawned app")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--mock-port", type=int, default=8001)
+    parser.add_argument("--no-spawn", action="store_true", help="test an app (and mock) that are already running")
+    parser.add_argument("--url", help="WebSocket URL, defaults to the spawned app")
+    parser.add_argument("--mock-url", help="mock base URL, defaults to the spawned mock")
+    parser.add_argument("--server-pid", type=int, help="app pid for RSS with --no-spawn")
+    args = parser.parse_args()
+    args.url = args.url or f"ws://127.0.0.1:{args.port}/crypto_listings/markets/ws"
+    args.mock_url = args.mock_url or f"http://127.0.0.1:{args.mock_port}"
+
+    processes, pid = [], args.server_pid
+    with tempfile.TemporaryDirectory() as data_dir:
+        try:
+            if not args.no_spawn:
+                processes, pid = spawn(args, data_dir)
+            results, rss = asyncio.run(run(args, pid))
+            report(args, results, rss)
+        finally:
+            for process in processes:
+                process.terminate()
+                process.wait()
@@ -0,0 +1,257 @@
+"""
+The purpose of this file is to tell whether a change to the get_assets transform makes it faster or slower, offline and
+repeatably, and to fail when it gets slower.
+
+Feeds /coins/markets payloads of 75, 1,000 and 15,000 coins, each with every tracked asset present and with some of them
+missing (so the synthetic fill runs), through the same steps as api.build_base_snapshot + api.derive_assets + the hub's
+JSON encode. Reports the median time and the peak memory allocated (tracemalloc) of every stage.
+
+Payloads come from benchmarks/fixtures/markets_<coins>.json.gz when recorded there (python benchmarks/bench_pipeline.py
+--record, needs network and takes a few minutes at the free plan's rate limit), otherwise from a seeded generator with
+the same shape as CoinGecko's, so every run sees identical input.
+
+Results are compared against benchmarks/baseline_pipeline.json, and the run exits with status 1 if any stage got slower
+(or allocates more) than the tolerance allows. Timings depend on the machine, so the baseline is not committed (it is in
+.gitignore): save one on the machine you compare on, before the change you want to measure. Without one the run only
+reports. "parse" is stdlib json.loads, it is reported but never gated and not part of "total".
+
+Run from backend/:
+python benchmarks/bench_pipeline.py --save-baseline
+python benchmarks/bench_pipeline.py
+"""
+
+# Imports
+import argparse
+import gzip
+import json
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+BENCHMARKS = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCHMARKS.parent / "src"))
+from api import SYMBOL_SUFFIX, asset_registry, fill_missing  # noqa: E402
+from encoding import encode  # noqa: E402
+from snapshot import MarketSnapshot  # noqa: E402
+from timestamps import to_epoch  # noqa: E402
+
+ASSETS = asset_registry.current()
+
+FIXTURES = BENCHMARKS / "fixtures"
+BASELINE = BENCHMARKS / "baseline_pipeline.json"
+
+SIZES = (75, 1_000, 15_000)
+MISSING_EVERY = 7  # "missing" cases drop every 7th tracked asset from the payload
+REPEATS = {75: 50, 1_000: 30, 15_000: 10}
+
+# Reported, but not ours to regress: stdlib json.loads
+UNGATED = ("parse",)
+
+# A stage only counts as a regression past both the relative tolerance and these absolute floors (timer noise)
+DEFAULT_TOLERANCE = 0.5
+FLOOR_MS = 0.05
+FLOOR_KIB = 16
+
+
+def make_payload(coins, seed=0):
+    """
+    A /coins/markets payload of coins entries, the tracked assets first, with CoinGecko's keys and value types
+    """
+    rng = random.Random(seed)
+    now = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    symbols = list(ASSETS.symbols) + [f"c{i:05d}" for i in range(max(0, coins - len(ASSETS)))]
+    payload = []
+    for rank, symbol in enumerate(symbols[:coins], start=1):
+        price = float(ASSETS.prices.get(symbol.upper(), rng.lognormvariate(0, 3)))
+        low, high = price * rng.uniform(0.9, 1.0), price * rng.uniform(1.0, 1.1)
+        change = price * rng.uniform(-0.1, 0.1)
+        supply = rng.uniform(1e6, 1e10)
+        payload.append(
+            {
+                "id": ASSETS.ids.get(symbol.upper(), f"coin-{symbol}"),
+                "symbol": symbol.lower(),
+                "name": symbol.upper(),
+                "image": f"https://assets.coingecko.com/coins/images/{rank}/large/{symbol.lower()}.png",
+                "current_price": price,
+                "market_cap": price * supply,
+                "market_cap_rank": rank,
+                "fully_diluted_valuation": None if rng.random() < 0.2 else price * supply * 1.2,
+                "total_volume": price * supply * rng.uniform(0.01, 0.2),
+                "high_24h": None if rng.random() < 0.01 else high,  # CoinGecko sends null for some thin coins
+                "low_24h": None if rng.random() < 0.01 else low,
+                "price_change_24h": change,
+                "price_change_percentage_24h": change / price * 100,
+                "market_cap_change_24h": change * supply,
+                "market_cap_change_percentage_24h": change / price * 100,
+                "circulating_supply": supply,
+                "total_supply": supply * 1.2,
+                "max_supply": None,
+                "ath": high * 2,
+                "ath_change_percentage": -50.0,
+                "ath_date": "2021-11-10T14:24:11.849Z",
+                "atl": low / 100,
+                "atl_change_percentage": 9999.0,
+                "atl_date": "2013-07-06T00:00:00.000Z",
+                "roi": None,
+                "last_updated": (now - timedelta(milliseconds=rng.randint(0, 600_000))).isoformat(
+                    timespec="milliseconds"
+                ).replace("+00:00", "Z"),
+            }
+        )
+    return payload
+
+
+def fixture_path(coins):
+    return FIXTURES / f"markets_{coins}.json.gz"
+
+
+def load_payload(coins):
+    """
+    Raw payload bytes, recorded if there is a fixture, generated otherwise. Returns (bytes, source).
+    """
+    path = fixture_path(coins)
+    if path.exists():
+        return gzip.decompress(path.read_bytes()), "recorded"
+    return json.dumps(make_payload(coins)).encode(), "generated"
+
+
+def record_fixtures():
+    """
+    Saves live /coins/markets pages (CAD, by market cap) as fixtures, paced for the free plan
+    """
+    import httpx
+
+    from api import COINGECKO_URL
+
+    FIXTURES.mkdir(parents=True, exist_ok=True)
+    coins = []
+    with httpx.Client(timeout=30) as client:
+        for page in range(1, max(SIZES) // 250 + 1):
+            response = client.get(
+                COINGECKO_URL,
+                params={"vs_currency": "cad", "order": "market_cap_desc", "per_page": 250, "page": page},
+            )
+            response.raise_for_status()
+            coins.extend(response.json())
+            print(f"page {page}: {len(coins):,} coins")
+            time.sleep(2.5)  # 30 calls per minute
+
+    # The tracked assets always lead, like a fetch by ids would return them
+    tracked = [coin for coin in coins if str(coin.get("symbol", "")).upper() in ASSETS]
+    others = [coin for coin in coins if str(coin.get("symbol", "")).upper() not in ASSETS]
+    for size in SIZES:
+        payload = (tracked + others)[:size]
+        fixture_path(size).write_bytes(gzip.compress(json.dumps(payload).encode()))
+        print(f"saved {fixture_path(size)} ({len(payload):,} coins)")
+
+
+def drop_missing(raw):
+    """
+    The same payload with every MISSING_EVERY-th tracked asset removed
+    """
+    dropped = {symbol.lower() for symbol in ASSETS.symbols[::MISSING_EVERY]}
+    return json.dumps([coin for coin in json.loads(raw) if coin.get("symbol") not in dropped]).encode()
+
+
+def pipeline():
+    """
+    (stage, function of the previous stage's output) in order, ending with the encoded message
+    """
+    return (
+        ("parse", json.loads),  # What response.json() does
+        ("from_coingecko", lambda data: MarketSnapshot.from_coingecko(data, to_epoch)),
+        ("filter_symbols", lambda snapshot: snapshot.filter_symbols(ASSETS.symbol_set)),
+        ("fill_missing", lambda snapshot: fill_missing(snapshot, assets=ASSETS)[0]),
+        ("ranked_by_bid", lambda snapshot: snapshot.ranked_by_bid()),
+        # derive_assets for a quote currency
+        ("scaled", lambda snapshot: snapshot.scaled(0.73, decimals=None).rounded()),
+        ("to_records", lambda snapshot: snapshot.to_records(suffix=SYMBOL_SUFFIX)),
+        ("encode", lambda data: encode({"channel": "rates", "event": "data", "vs_currency": "usd", "data": data})),
+    )
+
+
+def measure(raw, repeats):
+    """
+    {stage : {"ms": median milliseconds, "peak_kib": peak KiB allocated}} plus a "total" row of the gated stages
+    """
+    results = {}
+    value = raw
+    for stage, function in pipeline():
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            function(value)
+            timings.append((time.perf_counter() - start) * 1000)
+
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        output = function(value)
+        peak = tracemalloc.get_traced_memory()[1] - before
+        tracemalloc.stop()
+
+        results[stage] = {"ms": round(statistics.median(timings), 4), "peak_kib": round(peak / 1024, 1)}
+        value = output
+
+    gated = [result for stage, result in results.items() if stage not in UNGATED]
+    results["total"] = {
+        "ms": round(sum(r["ms"] for r in gated), 4),
+        "peak_kib": max(r["peak_kib"] for r in gated),
+    }
+    return results
+
+
+def regressions(case, results, baseline, tolerance):
+    found = []
+    for stage, result in results.items():
+        base = baseline.get(case, {}).get(stage)
+        if base is None or stage in UNGATED:
+            continue
+        if result["ms"] > base["ms"] * (1 + tolerance) and result["ms"] - base["ms"] > FLOOR_MS:
+            found.append(f"{case} {stage}: {base['ms']:.3f}ms -> {result['ms']:.3f}ms")
+        if result["peak_kib"] > base["peak_kib"] * (1 + tolerance) and result["peak_kib"] - base["peak_kib"] > FLOOR_KIB:
+            found.append(f"{case} {stage}: {base['peak_kib']:.1f}KiB -> {result['peak_kib']:.1f}KiB")
+    return found
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--record", action="store_true", help="record live fixtures before running")
+    parser.add_argument("--save-baseline", action="store_true", help=f"overwrite {BASELINE.name} with this run")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="allowed slowdown, 0.5 = +50%%")
+    args = parser.parse_args()
+
+    if args.record:
+        record_fixtures()
+
+    baseline = json.loads(BASELINE.read_text()) if BASELINE.exists() else {}
+    report, failures = {}, []
+    for size in SIZES:
+        raw, source = load_payload(size)
+        for variant, payload in (("complete", raw), ("missing", drop_missing(raw))):
+            case = f"{size}/{variant}"
+            results = report[case] = measure(payload, REPEATS[size])
+            failures += regressions(case, results, baseline, args.tolerance)
+
+            print(f"\n{case} ({source}, {len(payload):,} bytes)")
+            print(f"{'stage':>15} {'ms':>10} {'peak KiB':>10} {'baseline ms':>12}")
+            for stage in results:
+                base = baseline.get(case, {}).get(stage, {}).get("ms")
+                base = "-" if base is None else f"{base:.3f}"
+                print(f"{stage:>15} {results[stage]['ms']:>10.3f} {results[stage]['peak_kib']:>10.1f} {base:>12}")
+
+    if args.save_baseline:
+        BASELINE.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"\nSaved baseline to {BASELINE}")
+    elif failures:
+        print(f"\n{len(failures)} regression(s) beyond +{args.tolerance:.0%}:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    elif baseline:
+        print(f"\nNo regressions beyond +{args.tolerance:.0%}")
+    else:
+        print(f"\nNo {BASELINE.name} to compare with, run with --save-baseline on this machine first")
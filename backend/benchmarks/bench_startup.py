@@ -0,0 +1,97 @@
+"""
+The purpose of this file is to prove the app starts serving quickly with no network at all.
+
+It starts uvicorn in a subprocess with every HTTP(S) proxy pointed at a closed local port, so CoinGecko and the FX
+service are unreachable, then polls "/" until it answers. Reported times:
+
+1) import: seconds to import app.py (no network I/O happens at import)
+2) first response: seconds from spawning uvicorn to the first 200 on "/"
+3) bare FastAPI: the same for an empty FastAPI app, the interpreter + uvicorn + FastAPI floor no change here can lower
+4) app's own cost: first response minus bare FastAPI, the part this app adds
+
+The budget applies to 4). The absolute times mostly measure the machine (the floor alone is ~0.5s on a slow one).
+
+Run from backend/:
+python benchmarks/bench_startup.py
+"""
+
+# Imports
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parent.parent / "src"
+RUNS = 5
+BUDGET = 0.5  # Seconds the app may add on top of an empty FastAPI app before it serves
+
+SERVE = "import uvicorn; uvicorn.run({app}, port={port}, log_level='warning')"
+BARE_APP = "import fastapi; app = fastapi.FastAPI(); app.get('/')(lambda: 'ok'); "
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def offline_env():
+    env = dict(os.environ)
+    dead_proxy = "http://127.0.0.1:9"  # Discard port, nothing listens there
+    for key in ("HTTP_PROXY", "HTTPS_PROXY", "ALL_PROXY", "http_proxy", "https_proxy", "all_proxy"):
+        env[key] = dead_proxy
+    env["NO_PROXY"] = env["no_proxy"] = ""
+    return env
+
+
+def time_import():
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "import app"], cwd=SRC, env=offline_env(), check=True)
+    return time.perf_counter() - start
+
+
+def time_first_response(bare=False):
+    port = free_port()
+    code = BARE_APP + SERVE.format(app="app", port=port) if bare else SERVE.format(app="'app:app'", port=port)
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-c", code],
+        cwd=SRC,
+        env=offline_env(),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    opener = urllib.request.build_opener(urllib.request.ProxyHandler({}))  # Talk to the server directly
+    try:
+        while True:
+            try:
+                if opener.open(f"http://127.0.0.1:{port}/", timeout=1).status == 200:
+                    return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.01)
+            if time.perf_counter() - start > 30:
+                raise RuntimeError("Server did not start within 30s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    imports = [time_import() for _ in range(RUNS)]
+    # Interleaved, so both see the same machine load
+    pairs = [(time_first_response(), time_first_response(bare=True)) for _ in range(RUNS)]
+    responses = [app for app, _ in pairs]
+    bare = [floor for _, floor in pairs]
+    own = statistics.median(app - floor for app, floor in pairs)
+
+    print(f"import app          best {min(imports):.3f}s   worst {max(imports):.3f}s")
+    print(f"first response      best {min(responses):.3f}s   worst {max(responses):.3f}s")
+    print(f"bare FastAPI        best {min(bare):.3f}s   worst {max(bare):.3f}s")
+    print(f"app's own cost      median {own:.3f}s")
+
+    if own > BUDGET:
+        sys.exit(f"The app added {own:.3f}s to startup, more than {BUDGET}s")
@@ -0,0 +1,52 @@
+"""
+The purpose of this file is to measure the per-tick cost of converting "last_updated" stamps to Unix Epoch.
+
+Compares, for a few column sizes:
+1) strptime: the old per-asset datetime.strptime(...).timestamp() loop (also wrong, it reads UTC as local time)
+2) fromisoformat: per-asset datetime.fromisoformat, correct UTC handling
+3) to_epoch: timestamps.to_epoch, one vectorized NumPy parse for the whole column
+
+Run from backend/:
+python benchmarks/bench_timestamps.py
+"""
+
+# Imports
+import random
+import sys
+import timeit
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+from timestamps import parse_iso_utc, to_epoch  # noqa: E402
+
+SIZES = (75, 1_000, 5_000)
+REPEATS = 20
+
+
+def coingecko_stamps(n):
+    # Same shape as CoinGecko: millisecond precision with a trailing Z
+    now = datetime.now(timezone.utc)
+    return [
+        (now - timedelta(seconds=random.randint(0, 3600))).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+        for _ in range(n)
+    ]
+
+
+def strptime_loop(stamps):
+    return [int(datetime.strptime(s.rstrip("Z"), "%Y-%m-%dT%H:%M:%S.%f").timestamp()) for s in stamps]
+
+
+def fromisoformat_loop(stamps):
+    return [parse_iso_utc(s) for s in stamps]
+
+
+if __name__ == "__main__":
+    print(f"{'assets':>7} {'strptime':>12} {'fromisoformat':>14} {'to_epoch':>12}   (ms per tick)")
+    for size in SIZES:
+        stamps = coingecko_stamps(size)
+        timings = [
+            min(timeit.repeat(lambda: fn(stamps), number=1, repeat=REPEATS)) * 1000
+            for fn in (strptime_loop, fromisoformat_loop, to_epoch)
+        ]
+        print(f"{size:>7} {timings[0]:>12.3f} {timings[1]:>14.3f} {timings[2]:>12.3f}")
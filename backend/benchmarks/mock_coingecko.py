@@ -0,0 +1,121 @@
+"""
+The purpose of this file is to stand in for CoinGecko's /coins/markets endpoint during load tests, so runs are fully
+offline and repeatable and never spend API quota.
+
+Replays the recorded fixtures of bench_pipeline.py (or its seeded generator when none are recorded) and moves every
+price by a seeded random walk once per --tick-seconds. Requests are answered like CoinGecko: filtered by "ids",
+paginated with "per_page" and "page", priced in "vs_currency" (CAD fixtures, a fixed rate for anything else).
+
+To let bench_load.py measure tick -> client latency, the tick number is stamped into BTC's price_change_24h and the time
+each tick was first served is kept, readable at /mock/ticks.
+
+Run from backend/ (bench_load.py starts it by itself):
+python benchmarks/mock_coingecko.py --port 8001 --tick-seconds 1
+COINGECKO_URL=http://127.0.0.1:8001/api/v3/coins/markets python src/app.py
+"""
+
+# Imports
+import argparse
+import asyncio
+import copy
+import random
+import sys
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from bench_pipeline import load_payload  # noqa: E402 (also puts backend/src on the path)
+from encoding import decode, encode  # noqa: E402
+from fastapi import FastAPI  # noqa: E402
+from fastapi.responses import Response  # noqa: E402
+import uvicorn  # noqa: E402
+
+MARKER_SYMBOL = "btc"  # Its price_change_24h carries the tick number
+USD_PER_CAD = 0.73
+
+
+class MockMarket:
+    def __init__(self, coins, tick_seconds, seed=0):
+        raw, self.source = load_payload(coins)
+        self.coins = decode(raw)
+        self.tick_seconds = tick_seconds
+        self.rng = random.Random(seed)
+        self.tick = 0
+        self.served = {}  # tick : epoch seconds it was first served
+        self.encoded = {}  # (vs_currency, ids, per_page, page) : body, for the current tick only
+
+    def step(self):
+        """
+        Moves every price by up to ±0.5% and stamps the new tick number on the marker
+        """
+        self.tick += 1
+        self.encoded = {}
+        for coin in self.coins:
+            factor = 1 + self.rng.uniform(-0.005, 0.005)
+            for key in ("current_price", "high_24h", "low_24h"):
+                if coin.get(key) is not None:
+                    coin[key] *= factor
+            coin["last_updated"] = time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime())
+            if coin["symbol"] == MARKER_SYMBOL:
+                coin["price_change_24h"] = float(self.tick)
+
+    async def run(self):
+        while True:
+            self.step()
+            await asyncio.sleep(self.tick_seconds)
+
+    def page(self, vs_currency, ids, per_page, page):
+        key = (vs_currency, ids, per_page, page)
+        if key not in self.encoded:
+            coins = self.coins
+            if ids:
+                wanted = set(ids.split(","))
+                coins = [coin for coin in coins if coin["id"] in wanted]
+            coins = coins[(page - 1) * per_page : page * per_page]
+            if vs_currency != "cad":
+                coins = copy.deepcopy(coins)
+                for coin in coins:
+                    for price in ("current_price", "high_24h", "low_24h"):
+                        if coin.get(price) is not None:
+                            coin[price] *= USD_PER_CAD
+            self.encoded[key] = encode(coins)
+        self.served.setdefault(self.tick, time.time())
+        return self.encoded[key]
+
+
+def create_app(market):
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        task = asyncio.create_task(market.run())
+        yield
+        task.cancel()
+
+    app = FastAPI(title="Mock CoinGecko", lifespan=lifespan)
+
+    @app.get("/api/v3/coins/markets")
+    async def markets(vs_currency: str = "usd", ids: str = "", per_page: int = 100, page: int = 1):
+        body = market.page(vs_currency.lower(), ids, min(max(per_page, 1), 250), max(page, 1))
+        return Response(content=body, media_type="application/json")
+
+    @app.get("/mock/ticks")
+    async def ticks():
+        return {"source": market.source, "coins": len(market.coins), "served": market.served}
+
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline stand-in for CoinGecko /coins/markets")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--coins", type=int, default=1_000, help="payload size, 75, 1000 or 15000 for fixtures")
+    parser.add_argument("--tick-seconds", type=float, default=1.0, help="seconds between price updates")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    uvicorn.run(
+        create_app(MockMarket(args.coins, args.tick_seconds, args.seed)),
+        host="127.0.0.1",
+        port=args.port,
+        log_level="warning",
+    )
@@ -1,9 +1,10 @@
 """
 The purpose of this file is to handle the CoinGecko API fetch and simulate numbers for each coin based on baseline
-values provided in dicts>symbol_price_dict.py. Also providing params for faster search via dicts>symbol_price_dict.py.
+values provided by the asset registry (assets.py, read from dicts>assets.csv). Also providing params for faster
+search via the same registry.
 
-1) symbol_price_dict: contains dict of symbol : initial_value_CAD for desired coins
-2) symbol_id_dict: contains dict of symbol : id for desired coins
+1) prices: contains dict of symbol : initial_value_CAD for desired coins
+2) ids: contains dict of symbol : id for desired coins
 
 This is to speed up processing time in the assets.py file where we make an API call to GeckoCoin API. This occurs because dict:
 1) Provides a baseline set of values for initial_price_CAD. This is because there is a limited call rate on GeckoCoin API, this 
@@ -19,61 +20,157 @@ it is easier to refetch data. Moreover, it's also cleaner to do so.
 """
 
 # Imports
+import asyncio
+import importlib.util
 import os
-import random
-from datetime import datetime, timedelta
+import time
+from pathlib import Path
 
-import requests
-from dicts.assets import ASSETS
-from dicts.symbol_id_dict import SYMBOL_ID_DICT
-from dicts.symbol_price_dict import symbol_price_dict  # For symbol : initial_price_CAD
+from assets import DEFAULT_PATH as DEFAULT_ASSETS_FILE
+from assets import AssetRegistry
 from dotenv import load_dotenv
-from forex_python.converter import (  # For conversion to USD
-    CurrencyRates,
-    RatesNotAvailableError,
-)
+from fx import FxRates  # FX table used to derive every quote currency from CAD
+from metrics import SIMULATED_FALLBACK, TRANSFORM_SECONDS, UPSTREAM_LATENCY, UPSTREAM_RESPONSES
+from scheduler import DEFAULT_CALLS_PER_MINUTE, UpstreamScheduler
+from snapshot import MarketSnapshot
+from synthetic import SyntheticMarket
+from timestamps import to_epoch
+from tracing import span, tracer
 
 # Load environment variables from .env file
 load_dotenv()
 
-# Instantiate CurrencyRates object
-usd_conversion = CurrencyRates()
-try:
-    conversion_rate = usd_conversion.get_rate("CAD", "USD")
-except (RatesNotAvailableError, Exception) as e:
-    conversion_rate = 1.3
+# TRACE_EXPORT is "log" (JSON lines on stdout) or "file" (Chrome trace events in TRACE_FILE)
+tracer.configure(
+    float(os.getenv("TRACE_SAMPLE_RATE") or 0),
+    (os.getenv("TRACE_EXPORT") or "log").lower(),
+    os.getenv("TRACE_FILE") or "trace.json",
+)
+
+# Tracked symbols, their CoinGecko ids and initial_price_CAD, reloaded when ASSETS_FILE is edited
+asset_registry = AssetRegistry(os.getenv("ASSETS_FILE") or DEFAULT_ASSETS_FILE)
+
+# Every upstream call goes through the scheduler, sized to the CoinGecko plan
+scheduler = UpstreamScheduler(
+    int(os.getenv("CoinGecko_Calls_Per_Minute") or DEFAULT_CALLS_PER_MINUTE)
+)
+
+# CoinGecko is only ever asked for prices in BASE_CURRENCY, every other currency is derived locally through fx_rates
+BASE_CURRENCY = "cad"
+VS_CURRENCIES = tuple(
+    currency.strip().lower()
+    for currency in (os.getenv("QUOTE_CURRENCIES") or "cad,usd").split(",")
+    if currency.strip()
+)
+
+# Units of each currency per 1 BASE_CURRENCY, refreshed in the background by fx_rates.run() from the app lifespan.
+# Starts from the last known good table on disk, or from these rough placeholders on a first offline run
+fx_rates = FxRates(
+    BASE_CURRENCY,
+    os.getenv("FX_RATES_FILE") or Path(__file__).resolve().parent.parent / "data" / "fx_rates.json",
+    defaults={"usd": 0.73, "eur": 0.67, "gbp": 0.56},
+)
+
+
+# URL for CoinGecko API, point it at benchmarks/mock_coingecko.py for offline load tests
+COINGECKO_URL = os.getenv("COINGECKO_URL") or "https://api.coingecko.com/api/v3/coins/markets"
+
+# HTTP/2 is only used when the optional h2 package is installed
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# Long-lived pooled client, created lazily inside the running event loop
+_client = None
+_client_loop = None
+
+
+def new_client():
+    """
+    Builds the CoinGecko client. Blocking: the first call imports httpx and every call loads the CA bundle, a few
+    hundred ms of CPU that get_client() keeps off the event loop.
+    """
+    import httpx
+
+    return httpx.AsyncClient(
+        http2=HTTP2_AVAILABLE,
+        timeout=httpx.Timeout(10.0, connect=5.0),  # Never wait forever on CoinGecko
+        limits=httpx.Limits(
+            max_connections=10, max_keepalive_connections=5, keepalive_expiry=60
+        ),
+        headers={
+            "accept": "application/json",
+            "x-cg-api-key": os.getenv("CoinGecko_API_Key", ""),
+        },
+    )
+
+
+async def get_client():
+    """
+    Returns the shared AsyncClient, so connections to CoinGecko are kept alive and reused between ticks
+    """
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+
+    # A client is bound to the loop it was created in, make a new one if the loop changed
+    if _client is None or _client.is_closed or _client_loop is not loop:
+        # Built in a worker thread, so the server keeps answering while the first tick warms up
+        _client = await asyncio.to_thread(new_client)
+        _client_loop = loop
+    return _client
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def timed_get(client, params):
+    """
+    One CoinGecko request, recorded in the upstream latency and status metrics
+    """
+    import httpx
+
+    start = time.perf_counter()
+    with span("upstream_request", page=params["page"]) as request_span:
+        try:
+            response = await client.get(COINGECKO_URL, params=params)
+        except httpx.HTTPError:
+            UPSTREAM_RESPONSES.inc(status="error")
+            raise
+        finally:
+            UPSTREAM_LATENCY.observe(time.perf_counter() - start)
+        UPSTREAM_RESPONSES.inc(status=response.status_code)
+        request_span.set(status=response.status_code)
+    return response
+
 
+# Function to fetch data from the API without blocking the event loop
+async def fetch_crypto_data(vs_currency="cad", ids=None):  # Default to CAD for currency
+    import httpx
 
-# Function to fetch data from the API
-def fetch_crypto_data(vs_currency="cad"):  # Default to CAD for currency
     all_assets = []  # List to store assets
-    # URL for CoinGecko API
-    url = "https://api.coingecko.com/api/v3/coins/markets"
+    client = await get_client()
+    if ids is None:
+        ids = asset_registry.current().ids.values()
 
     # Parameters for the API
     params = {
         "vs_currency": vs_currency,  # Default to CAD
         "per_page": 250,  # Fetch 250 results per page, as per CoinGecko documentation
-        "ids": ",".join(
-            SYMBOL_ID_DICT.values()
-        ),  # Convert dict values to comma-separated string of coin IDs
+        "ids": ",".join(ids),  # Convert dict values to comma-separated string of coin IDs
         "page": 1,  # Begin at page 1
     }
-    # Headers for the API key
-    headers = {
-        "accept": "application/json",
-        "x-cg-api-key": os.getenv("CoinGecko_API_Key"),
-    }
     page = 1
 
     while True:
         params["page"] = page
         data = []  # Initializing data as empty list
         try:
-            response = requests.get(url, headers=headers, params=params)
+            response = await scheduler.request(lambda: timed_get(client, params))
             response.raise_for_status()
             data = response.json()
-        except requests.RequestException as e:
+        except (httpx.HTTPError, ValueError) as e:
             print(f"Failed due to: {e}")
 
         all_assets.extend(data)
@@ -86,180 +183,89 @@ def fetch_crypto_data(vs_currency="cad"):  # Default to CAD for currency
     return all_assets
 
 
-# Process and format asset data
-def get_assets(vs_currency="cad"):
-    data = fetch_crypto_data(vs_currency)  # Fetch new data
-
-    # Change "symbol" to uppercase for matching
-    for asset in data:
-        if isinstance(asset, dict) and "symbol" in asset:
-            asset["symbol"] = asset["symbol"].upper()
-
-    def get_random_timestamp():
-        random_date = datetime.now() - timedelta(days=random.randint(1, 30))
-        return int(random_date.timestamp())
-
-    def extract_keys(d):
-        return {
-            "name": d.get("name", "Unknown"),
-            "symbol": d.get("symbol", "UNKNOWN"),
-            "current_price": d.get("current_price", 0.0),
-            "high_24h": d.get("high_24h", 0.0),
-            "low_24h": d.get("low_24h", 0.0),
-            "last_updated": d.get("last_updated", get_random_timestamp()),
-            "price_change_24h": d.get("price_change_24h", 0.0),
-            "price_change_percentage_24h": d.get("price_change_percentage_24h", 0.0),
-        }
-
-    # Filter assets based on provided symbols
-    filtered_assets = [
-        extract_keys(d)
-        for d in data
-        if isinstance(d, dict) and d.get("symbol", None) in ASSETS
-    ]
+# "coingecko" (default) or "synthetic" to serve the simulated market for every asset without any upstream call
+MARKET_DATA_SOURCE = os.getenv("MARKET_DATA_SOURCE", "coingecko").lower()
+
+"""
+If there are missing assets, we get the spot_price from a simulated market seeded with the baseline prices in
+backend>src>dicts>assets.csv
+
+The reason for this was because have an API call limit from the GeckoCoin API, limiting how many times we can run.
+
+To simulate more real-world conditions the baselines were fetched by running the GeckoCoin API once in
+dicts>fetch_id_initial_price.py, which rewrites assets.csv. This acts as our baseline values for the day, and
+synthetic.py moves prices away from it tick by tick.
+"""
+synthetic_market = SyntheticMarket(
+    {},  # Symbols are added from the asset registry as they are first needed, see fill_missing
+    seed=int(os.environ["SYNTHETIC_SEED"]) if os.getenv("SYNTHETIC_SEED") else None,
+    tick_seconds=float(os.getenv("SYNTHETIC_TICK_SECONDS") or 1.0),
+)
+
+# Every symbol sent to clients carries this suffix
+SYMBOL_SUFFIX = "_CAD"
 
-    # Check for missing assets via symbols
-    symbols_in_data = {
-        d["symbol"] for d in data if isinstance(d, dict) and "symbol" in d
-    }
-    missing_assets = set(ASSETS) - symbols_in_data  # Finding the missing symbols
 
+def fill_missing(snapshot, vs_currency=BASE_CURRENCY, assets=None):
     """
-    If there are missing assets, we get the spot_price based on the values from symbol_price_dict.py under backend>src>dicts
-       
-    The reason for this was because have an API call limit from the GeckoCoin API, limiting how many times we can run. 
-    
-    To simulate more real-world conditions the dict was made by running the GeckoCoin API once in dicts>fetch_id_initial_price.py.
-    This file outputs a dict of the symbol:initial_price. This acts as our baseline values for the day.
-        
+    Adds simulated rows for the tracked assets the payload did not have. Returns (snapshot, missing symbols).
     """
+    assets = assets or asset_registry.current()
+    missing_assets = assets.symbol_set - set(snapshot.symbol.tolist())
     if missing_assets:
-        print(f"\n Missing assets from API call: {missing_assets} \n")
-        for missing_asset in missing_assets:
-            # Set previous week close to values that is stored in symbol_price_dict
-            previous_week_close = symbol_price_dict.get(missing_asset)
-            if previous_week_close is None:
-                continue  # Skip that specific coin
-            try:
-                previous_week_close = float(previous_week_close)  # Must be float logic
-            except ValueError:
-                previous_week_close = random.randint(
-                    0.1, 10
-                )  # If it's still a pain, give random value for simulation
-
-            if vs_currency == "usd":
-                previous_week_close *= conversion_rate  # Conversion to USD
-
-            # Get spot price from initial_prices_cad and ensure it ±50% of previous_week_close
-            spot_price = round(previous_week_close * random.uniform(0.5, 1.5), 2)
-
-            # Calculate bid and ask prices
-            bid = round(
-                spot_price * (1 - random.uniform(0.01, 0.05)), 2
-            )  # Bid is slightly lower than spot
-            ask = round(
-                spot_price * (1 + random.uniform(0.01, 0.05)), 2
-            )  # Ask is slightly higher than spot
-
-            # Set yesterday's price to a random value between 90% and 110% of spot_price
-            yesterday_price = round(
-                random.uniform(0.90 * spot_price, 1.10 * spot_price), 2
-            )
-
-            # Calculate the percentage change over the last 24 hours
-            price_change_percentage_24h = (
-                round(((spot_price - yesterday_price) / yesterday_price * 100), 2)
-                if yesterday_price != 0
-                else random.uniform(
-                    1, 50
-                )  # Case where either spot_price or yesterday_price is zero
-            )
-
-            # Calculate the price change over the last 24 hours without abs
-            price_change_24h = round(spot_price - yesterday_price, 2)
-
-            # Generate a random timestamp within the past 30 days
-            random_timestamp = get_random_timestamp()
-
-            # Add missing asset to the list with values
-            filtered_assets.append(
-                {
-                    "name": missing_asset,
-                    "symbol": f"{missing_asset}",
-                    "current_price": spot_price,
-                    "high_24h": ask,
-                    "low_24h": bid,
-                    "last_updated": random_timestamp,
-                    "price_change_24h": price_change_24h,
-                    "price_change_percentage_24h": price_change_percentage_24h,
-                }
-            )
-
-    # Continue processing
-    # Convert "last_updated" from ISO 8601 format to Unix Epoch without decimals
-    for unix_epoch in filtered_assets:
-        if unix_epoch["last_updated"] and isinstance(unix_epoch["last_updated"], str):
-            try:
-                # Remove the trailing 'Z' if present and parse the timestamp
-                unix_epoch["last_updated"] = int(
-                    datetime.strptime(
-                        unix_epoch["last_updated"].rstrip("Z"), "%Y-%m-%dT%H:%M:%S.%f"
-                    ).timestamp()
-                )
-            except ValueError:
-                # If parsing fails, assign the current timestamp
-                unix_epoch["last_updated"] = int(datetime.now().timestamp())
-
-        # Ensure numeric fields are not None
-        for field in [
-            "current_price",
-            "high_24h",
-            "low_24h",
-            "price_change_24h",
-            "price_change_percentage_24h",
-        ]:
-            if unix_epoch.get(field) is None:
-                unix_epoch[field] = 0.0
-
-    # Add _CAD suffix to each "symbol"
-    suffix = "_CAD"
-    for add_suffix in filtered_assets:
-        add_suffix["symbol"] += suffix
-
-    # Map old key names to new key names
-    keys_renaming = {
-        "last_updated": "timestamp",
-        "low_24h": "bid",
-        "high_24h": "ask",
-        "current_price": "spot",
-        "price_change_24h": "change",
-        "price_change_percentage_24h": "change_percentage",
-    }
+        synthetic_market.extend(assets.prices)  # Symbols added to the asset file since the last fill
+        synthetic_market.advance_to()  # Catch up with the ticks since the last call in one draw
+        simulated = synthetic_market.snapshot(sorted(missing_assets))  # Baselines are in CAD
+        if vs_currency != "cad":
+            simulated = simulated.scaled(fx_rates[vs_currency], decimals=None)
+        snapshot = MarketSnapshot.concat(snapshot, simulated.rounded())
+    return snapshot, missing_assets
 
-    renamed_keys = []  # List to store renamed asset dictionaries
 
-    for asset in filtered_assets:
-        # 'name' and 'symbol' remain unchanged
-        keys_renaming_dict = {
-            "name": asset.get("name", "Unknown"),
-            "symbol": asset.get("symbol", "UNKNOWN"),
-        }
-        # Rename other keys based on the mapping
-        for old_key, new_key in keys_renaming.items():
-            value = asset.get(old_key)
-            if value is None:
-                value = 0.0  # Assign default value if None
-            keys_renaming_dict[new_key] = value
+def build_base_snapshot(data, vs_currency=BASE_CURRENCY, log_missing=False, assets=None):
+    """
+    The whole transform from a /coins/markets payload to the ranked snapshot, no I/O (see benchmarks/bench_pipeline.py)
+    """
+    assets = assets or asset_registry.current()
 
-        renamed_keys.append(keys_renaming_dict)
+    # Uppercase symbols, zero missing prices and keep only the tracked assets, one pass per column
+    snapshot = MarketSnapshot.from_coingecko(data, to_epoch).filter_symbols(assets.symbol_set)
+
+    # Check for missing assets via symbols
+    snapshot, missing_assets = fill_missing(snapshot, vs_currency, assets)
+    if missing_assets and log_missing:
+        print(f"\n Missing assets from API call: {missing_assets} \n")
+        for symbol in missing_assets:
+            SIMULATED_FALLBACK.inc(symbol=symbol)
 
     # Sort the assets by 'bid' descending
-    sorted_renamed_keys = sorted(
-        renamed_keys, key=lambda x: x.get("bid", 0.0), reverse=True
-    )
-    return sorted_renamed_keys
+    return snapshot.ranked_by_bid()
+
+
+# Process and format asset data into a columnar snapshot, always in BASE_CURRENCY
+async def get_base_snapshot(vs_currency=BASE_CURRENCY):
+    assets = asset_registry.current()  # One table for the whole tick, even if the file is reloaded meanwhile
+    if MARKET_DATA_SOURCE == "synthetic":
+        data = []  # Every asset comes from the simulated market
+    else:
+        with span("fetch"):
+            data = await fetch_crypto_data(vs_currency, assets.ids.values())  # Fetch new data
+    with TRANSFORM_SECONDS.time(stage="build"), span("transform", coins=len(data)):
+        return build_base_snapshot(data, vs_currency, MARKET_DATA_SOURCE != "synthetic", assets)
+
+
+def derive_assets(base_snapshot, vs_currency=BASE_CURRENCY):
+    """
+    Converts a BASE_CURRENCY snapshot into vs_currency with one multiplication per price column and serializes it into
+    the dicts sent to clients. A positive rate keeps the bid order, so no re-sort is needed.
+    """
+    with TRANSFORM_SECONDS.time(stage="derive"), span("derive", vs_currency=vs_currency):
+        snapshot = base_snapshot
+        if vs_currency != BASE_CURRENCY:
+            snapshot = base_snapshot.scaled(fx_rates[vs_currency], decimals=None).rounded()
+        return snapshot.to_records(suffix=SYMBOL_SUFFIX)  # Add _CAD suffix to each "symbol"
 
 
-# Process formatting and data manipulation
-get_assets_list = get_assets()
-print(f"Asset information is: {get_assets_list}")
+# Fetch in BASE_CURRENCY and derive vs_currency, no extra upstream call for any other currency
+async def get_assets(vs_currency=BASE_CURRENCY):
+    return derive_assets(await get_base_snapshot(), vs_currency)
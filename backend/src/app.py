@@ -1,6 +1,7 @@
 """
 The purpose of this file is to create a WebSocket that enables connection to the crypto_listings/markets/ws endpoint. 
-It fetches data from api.py function get_assets() and then displays the data on a simply webpage.
+It receives data from the shared producer in broadcast.py (which fetches one CAD snapshot per tick and derives the other currencies from it) and then 
+displays the data on a simply webpage.
 
 NEXT STEPS
 1) This is not a wss connection as stated in the requirements, it is a ws. I am still trying to change it to that 
@@ -13,62 +14,214 @@ props such as switching from USD to CAD, etc.
 
 # Imports
 import asyncio  # To support asynchronous tasks
+import hmac
 import json
+import os
+import time
+from contextlib import asynccontextmanager
+from email.utils import formatdate, parsedate_to_datetime
 from pathlib import Path
 
-from api import get_assets
-from fastapi import BackgroundTasks, FastAPI, WebSocket, WebSocketDisconnect
-from fastapi.responses import HTMLResponse
+from api import BASE_CURRENCY, asset_registry, close_client, derive_assets, fx_rates, scheduler
+from backpressure import CLIENT_MAX_LAG_SECONDS, CLIENT_QUEUE_POLICY, CLIENT_QUEUE_SIZE, ClientQueue
+from broadcast import (
+    POLL_INTERVAL,
+    VS_CURRENCIES,
+    BroadcastHub,
+    normalize_symbol,
+    normalize_symbols,
+    run_producer,
+)
+from cache import snapshot_cache
+from candles import CANDLE_DTYPE, INTERVALS, CandleAggregator
+from compression import TunedWebSocketProtocol, add_http_compression, env_flag, vary_header
+from encoding import encode
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import HTMLResponse, Response
 from fastapi.staticfiles import StaticFiles
+from fx import DEFAULT_REFRESH_SECONDS
+from metrics import CONTENT_TYPE, Callback, CallbackHistogram, registry
+from profiler import DEFAULT_INTERVAL, MAX_SECONDS, SamplingProfiler
+from shared import DEFAULT_MAILBOX_BYTES, WorkerCoordinator
+from tickstore import TICK_DTYPE, TickStore
+from tracing import span
+from wire import FORMATS, msgpack
 
-app = FastAPI(title="Crypto Market Listing", version="1.0")
+# One hub shared by every WebSocket client
+hub = BroadcastHub()
+
+# Memory-mapped tick history, one day by default. With MULTI_WORKER every worker starts as a reader, the elected one
+# reopens the stores read-write in start_producer
+tick_store = TickStore(
+    os.getenv("TICK_STORE_DIR") or Path(__file__).resolve().parent.parent / "data" / "ticks",
+    retention_seconds=int(os.getenv("TICK_RETENTION_SECONDS") or 24 * 3600),
+    tick_interval=POLL_INTERVAL,
+    readonly=env_flag("MULTI_WORKER"),
+)
+
+# 1m/5m/1h candles built incrementally from every snapshot
+candles = CandleAggregator(
+    os.getenv("CANDLE_STORE_DIR") or Path(__file__).resolve().parent.parent / "data" / "candles",
+    readonly=env_flag("MULTI_WORKER"),
+)
+
+# Values that already live elsewhere, read when /metrics is scraped
+registry.register(Callback("connected_clients", "Open WebSocket subscriptions", hub.client_count))
+registry.register(
+    CallbackHistogram(
+        "client_send_queue_depth",
+        "Ticks waiting in each client's send queue",
+        lambda: [queue.qsize() for queue in hub.watching],
+        buckets=(0, 1, 2, 4, CLIENT_QUEUE_SIZE),
+    )
+)
+registry.register(
+    CallbackHistogram(
+        "client_lag_seconds",
+        "Publish to send delay of each client's last tick",
+        lambda: [queue.lag for queue in hub.watching if hasattr(queue, "lag")],
+        buckets=(0.01, 0.05, 0.1, 0.5, 1, 5, CLIENT_MAX_LAG_SECONDS),
+    )
+)
+registry.register(
+    Callback("upstream_rate_limited_total", "429s from CoinGecko", lambda: scheduler.rate_limited, kind="counter")
+)
+registry.register(
+    Callback("upstream_quota_tokens", "Calls left in the token bucket", lambda: scheduler.bucket.remaining())
+)
+registry.register(
+    Callback(
+        "snapshot_cache_age_seconds",
+        "Seconds since the cached snapshot was loaded",
+        snapshot_cache.ages,
+        labels=("vs_currency",),
+    )
+)
+registry.register(
+    Callback("fx_rate_age_seconds", "Age of the FX table, absent on placeholders", lambda: current_fx().age())
+)
+
+
+def producing():
+    """
+    True if this process polls upstream itself (single process, or the elected worker)
+    """
+    return coordinator is None or coordinator.is_producer
+
+
+def current_fx():
+    """
+    fx_rates, first reloaded from the table the producer saves when this worker is a follower (they never fetch, and
+    it costs one stat() while the file is unchanged)
+    """
+    if not producing():
+        fx_rates.load_if_changed()
+    return fx_rates
+
+
+def start_producer(publisher):
+    """
+    Starts the FX refresh and the upstream producer, publishing through publisher (the hub, or a SharedPublisher)
+    """
+    tick_store.writable()
+    candles.writable()
+    return [
+        asyncio.create_task(fx_rates.run(int(os.getenv("FX_REFRESH_SECONDS") or DEFAULT_REFRESH_SECONDS))),
+        asyncio.create_task(run_producer(publisher, snapshot_cache, recorders=(tick_store, candles))),
+    ]
+
+
+# With several workers only the elected one polls upstream, the others read its snapshots (see shared.py)
+coordinator = None
+if env_flag("MULTI_WORKER"):
+    coordinator = WorkerCoordinator(
+        os.getenv("SHARED_DIR") or Path(__file__).resolve().parent.parent / "data" / "shared",
+        hub,
+        VS_CURRENCIES,
+        start_producer,
+        capacity=int(os.getenv("SHARED_MAILBOX_BYTES") or DEFAULT_MAILBOX_BYTES),
+    )
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Starts the upstream producer (or, with MULTI_WORKER, the election) when the app starts and stops it on shutdown.
+    Nothing here is awaited, so the port binds straight away while FX and the first snapshot warm up in the background.
+    """
+    if coordinator is None:
+        background = start_producer(hub)
+    else:
+        background = [asyncio.create_task(coordinator.run())]
+    yield
+    for task in background:
+        task.cancel()
+    if coordinator is not None:
+        coordinator.close()
+    await close_client()
+    tick_store.flush()
+    candles.flush()
+
+
+app = FastAPI(title="Crypto Market Listing", version="1.0", lifespan=lifespan)
+add_http_compression(app)  # Opt-in gzip, see compression.py
 
 # Find frontend directory and and relevant files
 frontend_path = Path(__file__).resolve().parent.parent.parent / "frontend"
 app.mount("/frontend", StaticFiles(directory=str(frontend_path)), name="frontend")
 
-# Store previous asset data to compare changes
-previous_data = None
-
 
 # WebSocket endpoint
 @app.websocket("/crypto_listings/markets/ws")
 async def websocket_endpoint(websocket: WebSocket):
     await websocket.accept()
 
-    async def send_fresh_data(vs_currency="cad"):
+    # Ticks published by the hub land in this queue, bounded so a slow client cannot pile up ticks (see backpressure.py)
+    queue = ClientQueue()
+
+    # "snapshot" re-sends every asset on change, "delta" only sends the assets that changed
+    # "format" picks the wire format (see wire.py), symbols_sent is the packed symbol table version the client has
+    subscription = {"mode": "snapshot", "format": "json", "symbols_sent": 0}
+
+    async def send_fresh_data():
         """
-        Fetches the latest asset data from api.py and sends to client (frontend in this case) if there's a change
+        Sends every tick the hub publishes for this client's currency to the client (frontend in this case)
         """
         try:
-            global previous_data  # Defining placeholder for data to check if there are any chances
-            fresh_data = get_assets(vs_currency)
-
-            # Check if there is a change in data
-            if fresh_data != previous_data:
-                response_data = {
-                    "channel": "rates",
-                    "event": "data",
-                    "data": fresh_data,
-                }
-                await websocket.send_text(json.dumps(response_data, indent=4))
-                previous_data = fresh_data  # Update previous data
-
-        except Exception as e:
-            print(f"Error fetching data: {e}")
-
-    # Background task to continuously check API for changes
-    async def continuous_check():
-        while True:
-            await send_fresh_data()
-            await asyncio.sleep(
-                10
-            )  # Check every 10 seconds. For real-world applications, this would be far faster
+            while True:
+                tick = await queue.next_tick()
+                if tick is None:
+                    # Fell too far behind under the "disconnect" policy
+                    await websocket.close(code=1013, reason="Client too slow")
+                    return
+                payload = tick.message(subscription["mode"], subscription["format"])  # Shared by every subscriber
 
-    try:
-        # Start continuous check when the WebSocket connection opens
-        task = asyncio.create_task(continuous_check())
+                # Packed rows refer to symbols by index, send the table first whenever it has grown
+                if (
+                    subscription["format"] == "packed"
+                    and hub.symbol_table.version > subscription["symbols_sent"]
+                ):
+                    await websocket.send_bytes(hub.symbol_table.encode())
+                    subscription["symbols_sent"] = hub.symbol_table.version
 
+                # A send that cannot complete within the lag limit means a stalled connection, not just a slow one
+                send = websocket.send_bytes if isinstance(payload, bytes) else websocket.send_text
+                try:
+                    with span("send", tick.trace, client=queue.id, size=len(payload)):
+                        await asyncio.wait_for(send(payload), timeout=CLIENT_MAX_LAG_SECONDS)
+                except asyncio.TimeoutError:
+                    queue.disconnect()
+                    await websocket.close(code=1013, reason="Client too slow")
+                    return
+                queue.sent += 1
+        except (WebSocketDisconnect, RuntimeError):
+            return  # Gone (or closed by the endpoint) mid-send, the receive loop below cleans up
+
+    # Start receiving CAD snapshots when the WebSocket connection opens
+    hub.subscribe(queue, "cad")
+    task = asyncio.create_task(send_fresh_data())
+
+    try:
         while True:
             data = await websocket.receive_text()
             message = json.loads(data)
@@ -79,12 +232,231 @@ async def websocket_endpoint(websocket: WebSocket):
                 and message.get("channel") == "rates"
             ):
                 vs_currency = message.get("vs_currency", "cad")
-                print("Subscription made, fetching new data...")
-                await send_fresh_data(vs_currency)
+                if vs_currency not in VS_CURRENCIES:
+                    vs_currency = "cad"
+                if vs_currency not in hub.latest and vs_currency not in current_fx():
+                    # Quoted, but no FX rate to derive it with yet (offline FX fetch and no built-in default)
+                    await websocket.send_text(
+                        encode(
+                            {
+                                "channel": "rates",
+                                "event": "error",
+                                "vs_currency": vs_currency,
+                                "message": f"No FX rate for {vs_currency} yet, try again later",
+                            }
+                        )
+                    )
+                    continue
+                if message.get("mode") in ("snapshot", "delta"):
+                    subscription["mode"] = message["mode"]
+
+                fmt = message.get("format", "json")
+                if fmt == "msgpack" and msgpack is None:
+                    await websocket.send_text(
+                        encode(
+                            {
+                                "channel": "rates",
+                                "event": "error",
+                                "message": "msgpack is not installed on the server, sending json",
+                            }
+                        )
+                    )
+                    fmt = "json"
+                if fmt in FORMATS and fmt != subscription["format"]:
+                    subscription["format"] = fmt
+                    subscription["symbols_sent"] = 0  # A new packed client needs the whole table
+
+                # Optional list of symbols to watch, added to the ones already watched in this currency
+                symbols = message.get("symbols")
+                if isinstance(symbols, list):
+                    symbols = normalize_symbols(symbols)
+                    watched_currency, watched = hub.watching.get(queue, (None, None))
+                    if watched_currency == vs_currency and watched is not None:
+                        symbols |= watched
+                else:
+                    symbols = None  # Every symbol
+
+                print("Subscription made, sending latest data...")
+                # Latest published data, only the very first subscriber before any tick waits on CoinGecko
+                snapshot = hub.latest.get(vs_currency)
+                if snapshot is None and producing():  # Followers wait for the producer's first snapshot
+                    snapshot = derive_assets(await snapshot_cache.get(BASE_CURRENCY), vs_currency)
+                hub.subscribe(queue, vs_currency, snapshot, symbols, fx_rates.info(vs_currency))
+
+            # Check for unsubscription event, with symbols it only stops those symbols
+            elif (
+                message.get("event") == "unsubscribe"
+                and message.get("channel") == "rates"
+            ):
+                symbols = message.get("symbols")
+                if isinstance(symbols, list):
+                    hub.unwatch(queue, normalize_symbols(symbols))
+                else:
+                    hub.unsubscribe(queue)
 
     except WebSocketDisconnect:
         print("Client is disconnected")
-        task.cancel()  # Stop the background task when client disconnects
+    finally:
+        hub.unsubscribe(queue)
+        task.cancel()  # Stop the sender task when client disconnects
+
+
+def not_modified(request, tick):
+    """
+    True if the client's If-None-Match (or, without it, If-Modified-Since) says it already has this tick
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # Weak comparison, as If-None-Match requires
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or tick.etag().removeprefix("W/") in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(tick.published_at) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+# Latest snapshot over plain HTTP for cron jobs and probes, served from memory, never calls CoinGecko
+@app.get("/crypto_listings/markets")
+async def latest_markets(request: Request, vs_currency: str = "cad"):
+    if vs_currency not in VS_CURRENCIES:
+        raise HTTPException(status_code=400, detail=f"vs_currency must be one of {VS_CURRENCIES}")
+
+    tick = hub.latest_tick.get(vs_currency)
+    if tick is None and vs_currency not in current_fx():
+        # The producer skips a currency it has no FX rate for until the FX table has one
+        raise HTTPException(
+            status_code=503, detail=f"FX rate for {vs_currency} unavailable", headers={"Retry-After": "60"}
+        )
+    if tick is None:
+        # Still warming up after startup, the producer publishes within one poll interval
+        raise HTTPException(status_code=503, detail="No snapshot yet", headers={"Retry-After": "5"})
+
+    headers = {
+        "ETag": tick.etag(),
+        "Last-Modified": formatdate(tick.published_at, usegmt=True),
+        "Cache-Control": "no-cache",  # Always revalidate, a 304 costs almost nothing
+    }
+    fx_as_of = (tick.fx or {}).get("as_of")
+    if fx_as_of is not None:
+        # Age of the rate this tick was converted with, the body says how old it was when the tick was published
+        headers["X-FX-Age"] = str(int(max(0.0, time.time() - fx_as_of)))
+    if not_modified(request, tick):
+        return Response(status_code=304, headers={**headers, **vary_header(request)})
+    body = tick.message()
+    return Response(content=body, media_type="application/json", headers={**headers, **vary_header(request, body)})
+
+
+# Tick history of one symbol between start and end (Unix Epoch seconds), read straight from the tick store
+@app.get("/crypto_listings/markets/history")
+async def market_history(symbol: str, vs_currency: str = "cad", start: int = None, end: int = None):
+    if vs_currency not in VS_CURRENCIES:
+        raise HTTPException(status_code=400, detail=f"vs_currency must be one of {VS_CURRENCIES}")
+
+    symbol = normalize_symbol(symbol)  # "btc" and "BTC_CAD" both work, like the WebSocket symbol lists
+    views = tick_store.read(vs_currency, symbol, start, end)
+    return {
+        "symbol": symbol,
+        "vs_currency": vs_currency,
+        **{key: [value for view in views for value in view[key].tolist()] for key in TICK_DTYPE.names},
+    }
+
+
+# Candles of one symbol between start and end (Unix Epoch seconds), served from the candle store, not raw ticks
+@app.get("/crypto_listings/markets/candles")
+async def market_candles(
+    symbol: str, interval: str = "1m", vs_currency: str = "cad", start: int = None, end: int = None
+):
+    if vs_currency not in VS_CURRENCIES:
+        raise HTTPException(status_code=400, detail=f"vs_currency must be one of {VS_CURRENCIES}")
+    if interval not in INTERVALS:
+        raise HTTPException(status_code=400, detail=f"interval must be one of {tuple(INTERVALS)}")
+
+    symbol = normalize_symbol(symbol)
+    closed, current = candles.read(vs_currency, symbol, interval, start, end)
+    return {
+        "symbol": symbol,
+        "vs_currency": vs_currency,
+        "interval": interval,
+        **{key: [value for view in closed for value in view[key].tolist()] for key in CANDLE_DTYPE.names},
+        "current": current,  # Still open, changes until the interval ends
+    }
+
+
+# The FX table every quote currency is derived from, with its age and where it came from
+@app.get("/crypto_listings/fx")
+async def fx_table():
+    age = current_fx().age()
+    return {
+        "base": fx_rates.base,
+        "as_of": fx_rates.as_of,
+        "age": None if age is None else round(age, 1),
+        "source": fx_rates.source,
+        "failures": fx_rates.failures,
+        "rates": {currency: fx_rates.rates[currency] for currency in VS_CURRENCIES if currency in fx_rates},
+    }
+
+
+# Per-client queue depth, lag and drops, to spot slow consumers
+@app.get("/crypto_listings/markets/clients")
+async def client_stats():
+    return {
+        "policy": CLIENT_QUEUE_POLICY,
+        "capacity": CLIENT_QUEUE_SIZE,
+        "max_lag": CLIENT_MAX_LAG_SECONDS,
+        "clients": hub.client_stats(),
+    }
+
+
+# Prometheus text format, see metrics.py
+@app.get("/metrics")
+async def metrics():
+    return Response(content=registry.render(), media_type=CONTENT_TYPE)
+
+
+# Which version of the asset file is being served, see assets.py
+@app.get("/crypto_listings/markets/assets")
+async def asset_stats():
+    return asset_registry.stats()
+
+
+# Samples every thread's stack for a few seconds and returns them folded (flamegraph.pl, speedscope), see profiler.py
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+profiling = asyncio.Lock()
+
+
+@app.get("/admin/profile")
+async def profile(request: Request, seconds: float = 10, interval_ms: float = DEFAULT_INTERVAL * 1000):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")  # Disabled, do not advertise it
+    # Bytes on both sides, compare_digest refuses str with non-ASCII characters. Headers are decoded as latin-1, so
+    # encoding back with it gives the raw bytes the client sent
+    token = request.headers.get("X-Admin-Token", "").encode("latin-1")
+    if not hmac.compare_digest(token, ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+    if not 0 < seconds <= MAX_SECONDS:
+        raise HTTPException(status_code=400, detail=f"seconds must be between 0 and {MAX_SECONDS}")
+    if not 1 <= interval_ms <= 1000:
+        raise HTTPException(status_code=400, detail="interval_ms must be between 1 and 1000")
+    if profiling.locked():
+        raise HTTPException(status_code=409, detail="A profile is already running")
+
+    async with profiling:
+        profiler = SamplingProfiler(interval_ms / 1000)
+        profiler.start()
+        try:
+            await asyncio.sleep(seconds)  # The server keeps serving while it is sampled
+        finally:
+            profiler.stop()
+    return Response(
+        content=profiler.folded(),
+        media_type="text/plain",
+        headers={"X-Profile-Samples": str(profiler.samples)},
+    )
 
 
 # Serve the HTML page
@@ -97,10 +469,13 @@ async def get():
 if __name__ == "__main__":
     import uvicorn
 
+    workers = int(os.getenv("WEB_WORKERS") or 1)
     uvicorn.run(
-        app,
+        "app:app" if workers > 1 else app,  # Several workers need an import string, set MULTI_WORKER with them
         host="127.0.0.1",
         port=8000,
+        workers=workers,
+        ws=TunedWebSocketProtocol,  # Tuned permessage-deflate with WS_DEFLATE, see compression.py
         # Uncomment and add SSL setup if using HTTPS
         # ssl_keyfile=".certifications/cert.pem",
         # ssl_certfile=".certifications/cert.pem",
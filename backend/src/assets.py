@@ -0,0 +1,137 @@
+"""
+The purpose of this file is to change the tracked assets, their CoinGecko ids or their baseline prices without editing
+Python and restarting the server.
+
+They used to live in three generated modules under dicts (assets.py, symbol_id_dict.py, symbol_price_dict.py) that
+dicts>fetch_id_initial_price.py rewrote as Python source, and ASSETS was a list scanned for every asset. Now they live
+in one CSV file (dicts>assets.csv, or ASSETS_FILE in .env), one row per asset: symbol, CoinGecko id, baseline CAD price.
+
+AssetRegistry:
+1) loads the file on first use, not at import
+2) indexes it into an AssetTable of a frozenset and dicts, so every lookup is a hash lookup
+3) checks the file's size and mtime at most every CHECK_SECONDS and reloads it when either changed
+4) swaps the whole table in one assignment. A tick takes the table once and keeps using it until it is done, so a reload
+never mixes two files in one tick. A file that fails to parse is ignored and the previous table kept.
+
+Edit the file in place or (better) write a new one and rename it over, the next tick picks it up. api.py builds the
+registry everybody shares (asset_registry) once it has loaded .env.
+"""
+
+# Imports
+import csv
+import os
+import time
+from pathlib import Path
+
+from metrics import registry
+
+CHECK_SECONDS = 1.0  # At most one stat() per second, however often the table is asked for
+
+DEFAULT_PATH = Path(__file__).resolve().parent / "dicts" / "assets.csv"
+
+RELOADS = registry.counter("asset_registry_reloads_total", "Asset file (re)loads, by outcome", ("outcome",))
+
+
+class AssetTable:
+    """
+    One immutable version of the asset file
+    """
+
+    def __init__(self, rows, version, stamp):
+        self.symbols = tuple(symbol for symbol, _, _ in rows)  # In file order
+        self.symbol_set = frozenset(self.symbols)
+        self.ids = {symbol: coin_id for symbol, coin_id, _ in rows if coin_id}  # symbol : CoinGecko id
+        self.prices = {symbol: price for symbol, _, price in rows if price is not None}  # symbol : baseline CAD
+        self.version = version
+        self.stamp = stamp  # (size, mtime_ns) of the file it was read from
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def __contains__(self, symbol):
+        return symbol in self.symbol_set
+
+
+def parse(path):
+    """
+    Reads (symbol, CoinGecko id, baseline price or None) rows. Symbols are uppercased, duplicates are an error.
+    """
+    rows, seen = [], set()
+    with open(path, newline="") as f:
+        for line, row in enumerate(csv.DictReader(f), start=2):
+            symbol = (row.get("symbol") or "").strip().upper()
+            if not symbol:
+                continue
+            if symbol in seen:
+                raise ValueError(f"line {line}: {symbol} is listed twice")
+            seen.add(symbol)
+            price = (row.get("baseline_price_cad") or "").strip()
+            rows.append((symbol, (row.get("coingecko_id") or "").strip(), float(price) if price else None))
+    if not rows:
+        raise ValueError("no assets")
+    return rows
+
+
+class AssetRegistry:
+    def __init__(self, path=DEFAULT_PATH, check_seconds=CHECK_SECONDS):
+        self.path = Path(path)
+        self.check_seconds = check_seconds
+        self.table = None
+        self.checked_at = 0.0  # Monotonic time of the last stat()
+        self.failures = 0
+        self.rejected = None  # (size, mtime_ns) of the last file that failed to parse
+
+    def _stamp(self):
+        stat = os.stat(self.path)
+        return stat.st_size, stat.st_mtime_ns
+
+    def reload(self):
+        """
+        Reads the file into a new table and swaps it in. Keeps the current table (and returns False) if it cannot.
+        """
+        try:
+            stamp = self._stamp()
+            rows = parse(self.path)
+        except (OSError, ValueError, csv.Error) as e:
+            if self.table is None:
+                raise  # Nothing to fall back on
+            self.failures += 1
+            self.rejected = None if isinstance(e, OSError) else stamp  # Not retried until the file changes again
+            RELOADS.inc(outcome="error")
+            print(f"Keeping asset table version {self.table.version}, {self.path} is unreadable: {e}")
+            return False
+        version = 1 if self.table is None else self.table.version + 1
+        self.table = AssetTable(rows, version, stamp)
+        RELOADS.inc(outcome="ok")
+        if version > 1:
+            print(f"Reloaded {len(rows)} assets from {self.path} (version {version})")
+        return True
+
+    def current(self):
+        """
+        The latest table, loading the file on first use and reloading it when it changed
+        """
+        now = time.monotonic()
+        if self.table is None:
+            self.checked_at = now
+            self.reload()
+        elif now - self.checked_at >= self.check_seconds:
+            self.checked_at = now
+            try:
+                stamp = self._stamp()
+                changed = stamp != self.table.stamp and stamp != self.rejected
+            except OSError:
+                changed = False  # Mid-rename or deleted, keep serving the current table
+            if changed:
+                self.reload()
+        return self.table
+
+    def stats(self):
+        table = self.current()
+        return {
+            "path": str(self.path),
+            "version": table.version,
+            "assets": len(table),
+            "failures": self.failures,
+        }
+
@@ -0,0 +1,135 @@
+"""
+The purpose of this file is to stop one slow WebSocket client from piling up unsent ticks without bound.
+
+The hub pushes every tick into each client's queue without waiting, and each connection drains its own queue with
+send_text/send_bytes. A client on a slow link used to let that queue grow forever. ClientQueue bounds it
+(CLIENT_QUEUE_SIZE ticks) and applies CLIENT_QUEUE_POLICY once it is full:
+
+1) "coalesce": throw the backlog away and queue one full snapshot of the newest tick, the client skips straight to now
+2) "drop": throw the oldest queued tick away, the next tick that goes out is sent as a full snapshot so delta clients
+resynchronize
+3) "disconnect": close the connection, also once a tick waited longer than CLIENT_MAX_LAG_SECONDS to go out
+
+Lag is measured from when a tick was queued for this client, not from when it was published: a new subscriber is
+handed the latest tick, which can be minutes old when upstream has not changed, and that is not the client's fault.
+
+Every queue keeps its own lag and drop counters, served by the crypto_listings/markets/clients endpoint.
+"""
+
+# Imports
+import asyncio
+import itertools
+import os
+import time
+
+from metrics import registry
+
+POLICIES = ("coalesce", "drop", "disconnect")
+
+CLIENT_QUEUE_SIZE = int(os.getenv("CLIENT_QUEUE_SIZE") or 8)  # Ticks, a few poll intervals
+CLIENT_QUEUE_POLICY = os.getenv("CLIENT_QUEUE_POLICY") or "coalesce"
+CLIENT_MAX_LAG_SECONDS = float(os.getenv("CLIENT_MAX_LAG_SECONDS") or 30)
+
+_client_ids = itertools.count(1)
+
+TICKS_SHED = registry.counter(
+    "client_ticks_shed_total", "Ticks never sent because a client fell behind, by policy", ("policy",)
+)
+SLOW_DISCONNECTS = registry.counter("client_slow_disconnects_total", "Connections closed for being too slow")
+
+
+class ClientQueue(asyncio.Queue):
+    """
+    Bounded queue of ticks for one client. put_nowait never blocks or raises, the hub can always hand a tick over.
+    Items are (tick, monotonic time queued), the sentinel None included.
+    """
+
+    def __init__(self, maxsize=CLIENT_QUEUE_SIZE, policy=CLIENT_QUEUE_POLICY, max_lag=CLIENT_MAX_LAG_SECONDS):
+        if policy not in POLICIES:
+            raise ValueError(f"policy must be one of {POLICIES}, got {policy!r}")
+        super().__init__(max(1, maxsize))
+        self.policy = policy
+        self.max_lag = max_lag
+        self.id = next(_client_ids)
+        self.connected_at = time.time()
+        self.resync = False  # Ticks were dropped, the next one must go out as a full snapshot
+        self.closing = False  # Too slow, the sender closes the connection and nothing more is queued
+
+        # Metrics
+        self.sent = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.lag = 0.0  # Seconds between queuing and sending the last tick
+        self.peak_lag = 0.0
+
+    def _clear(self):
+        cleared = 0
+        while not self.empty():
+            self.get_nowait()
+            cleared += 1
+        return cleared
+
+    def put_nowait(self, tick):
+        if self.closing:
+            return
+        if self.full():
+            if self.policy == "disconnect":
+                self.disconnect()
+                return
+            if self.policy == "coalesce":
+                cleared = self._clear()
+                self.coalesced += cleared
+                TICKS_SHED.inc(cleared, policy="coalesce")
+                tick = tick.as_snapshot()  # One full snapshot replaces the whole backlog
+            else:
+                self.get_nowait()
+                self.dropped += 1
+                TICKS_SHED.inc(policy="drop")
+                self.resync = True
+        super().put_nowait((tick, time.monotonic()))
+
+    def disconnect(self):
+        """
+        Drops the backlog and wakes the sender with None so it closes the connection
+        """
+        if self.closing:
+            return
+        self.closing = True
+        cleared = self._clear()
+        self.dropped += cleared
+        TICKS_SHED.inc(cleared, policy=self.policy)
+        SLOW_DISCONNECTS.inc()
+        super().put_nowait((None, time.monotonic()))
+
+    async def next_tick(self):
+        """
+        Waits for the next tick to send, None once the client has to be disconnected
+        """
+        tick, queued_at = await self.get()
+        if tick is None:
+            return None
+
+        self.lag = time.monotonic() - queued_at
+        self.peak_lag = max(self.peak_lag, self.lag)
+        if self.policy == "disconnect" and self.lag > self.max_lag:
+            self.disconnect()
+            return None
+
+        if self.resync:
+            self.resync = False
+            tick = tick.as_snapshot()
+        return tick
+
+    def stats(self):
+        return {
+            "id": self.id,
+            "policy": self.policy,
+            "queued": self.qsize(),
+            "capacity": self.maxsize,
+            "lag": round(self.lag, 3),
+            "peak_lag": round(self.peak_lag, 3),
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+            "connected_for": round(time.time() - self.connected_at, 1),
+        }
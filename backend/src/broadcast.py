@@ -0,0 +1,350 @@
+"""
+The purpose of this file is to share one upstream poller between every WebSocket client connected to the
+crypto_listings/markets/ws endpoint.
+
+Previously each connection started its own loop that called get_assets() every 10 seconds, so the number of CoinGecko
+calls grew with the number of open browser tabs. Now there is:
+
+1) BroadcastHub: keeps the latest snapshot for each vs_currency and the queues of the clients subscribed to it.
+2) run_producer: one background task (started with the app lifespan) that fetches BASE_CURRENCY once per tick,
+derives every other vs_currency from the FX table and publishes each to the hub, which pushes the same data to every
+subscriber.
+
+Upstream cost therefore stays constant no matter how many clients are connected or how many currencies are quoted.
+
+Change detection is per asset: every tick carries the full snapshot plus only the assets whose DELTA_FIELDS changed,
+so clients subscribed in delta mode receive one full snapshot and then just the moving symbols.
+
+Each tick is encoded once per wire format (see wire.py) and every subscriber is handed the same text or bytes. JSON is
+encoded in the producer, binary formats the first time a subscriber asks for them.
+"""
+
+# Imports
+import asyncio
+import hashlib
+import os
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field, replace
+
+from api import BASE_CURRENCY, SYMBOL_SUFFIX, VS_CURRENCIES, derive_assets, fx_rates, scheduler
+from encoding import encode
+from metrics import BROADCAST_SECONDS, PRODUCER_ERRORS, RECORDER_ERRORS, SERIALIZED_BYTES
+from tracing import current_trace, span, tracer
+from wire import KIND_DELTA, KIND_SNAPSHOT, SymbolTable, pack_msgpack, pack_rows
+
+# Seconds between upstream fetches. For real-world applications, this would be far faster
+POLL_INTERVAL = float(os.getenv("POLL_INTERVAL") or 10)
+
+# Fields compared per asset to decide whether it goes into a delta
+DELTA_FIELDS = ("spot", "bid", "ask", "change", "change_percentage")
+
+
+@dataclass
+class Tick:
+    """
+    One published update. changed is None for a full snapshot (e.g. on subscribe), otherwise it holds only the
+    assets that moved since the previous tick and removed holds the symbols that disappeared.
+
+    Messages are encoded once per mode and format and cached on the tick, so every subscriber shares the same payload.
+    """
+
+    vs_currency: str
+    snapshot: list
+    changed: list = None
+    removed: list = field(default_factory=list)
+    symbol_table: SymbolTable = None  # Needed by the "packed" format only
+    encoded: dict = field(default_factory=dict)  # (mode, format) : encoded message
+    published_at: float = field(default_factory=time.time)  # Epoch seconds, Last-Modified for the REST snapshot
+    fx: dict = None  # FX rate the prices were converted with and its age, see FxRates.info()
+    trace: object = field(default=None, repr=False)  # tracing.Trace when this tick was sampled
+    _etag: str = field(default=None, repr=False)
+
+    def etag(self):
+        """
+        Weak ETag of the JSON snapshot message, computed once per tick. Weak because the same tag covers the gzip and
+        identity encodings of the body (HTTP_GZIP), which are not byte for byte the same.
+        """
+        if self._etag is None:
+            digest = hashlib.blake2b(self.message().encode(), digest_size=12).hexdigest()
+            self._etag = f'W/"{digest}"'
+        return self._etag
+
+    def as_snapshot(self):
+        """
+        The same tick as a full snapshot, for clients whose earlier deltas were dropped. Shares the encoded cache, a
+        full tick only ever encodes snapshot messages.
+        """
+        if self.changed is None:
+            return self
+        return replace(self, changed=None, removed=[])
+
+    def message(self, mode="snapshot", fmt="json"):
+        if mode != "delta" or self.changed is None:
+            mode = "snapshot"  # Full snapshots go out whole whatever the mode
+
+        key = (mode, fmt)
+        if key in self.encoded:
+            return self.encoded[key]
+
+        with span("encode", self.trace, format=fmt, mode=mode) as encode_span:
+            if fmt == "packed":
+                if mode == "delta":
+                    payload = pack_rows(KIND_DELTA, self.changed, self.symbol_table, self.removed)
+                else:
+                    payload = pack_rows(KIND_SNAPSHOT, self.snapshot, self.symbol_table)
+            else:
+                if mode == "delta":
+                    message = {
+                        "channel": "rates",
+                        "event": "delta",
+                        "vs_currency": self.vs_currency,
+                        "data": self.changed,
+                        "removed": self.removed,
+                        "fx": self.fx,
+                    }
+                else:
+                    message = {
+                        "channel": "rates",
+                        "event": "data",
+                        "vs_currency": self.vs_currency,
+                        "data": self.snapshot,
+                        "fx": self.fx,
+                    }
+                payload = pack_msgpack(message) if fmt == "msgpack" else encode(message)
+            encode_span.set(size=len(payload))
+
+        self.encoded[key] = payload
+        SERIALIZED_BYTES.inc(len(payload), format=fmt, mode=mode)
+        return payload
+
+
+def diff_assets(previous, current):
+    """
+    Compares two {symbol : asset} dicts and returns (changed assets, removed symbols)
+    """
+    changed = [
+        asset
+        for symbol, asset in current.items()
+        if symbol not in previous
+        or any(asset.get(key) != previous[symbol].get(key) for key in DELTA_FIELDS)
+    ]
+    removed = [symbol for symbol in previous if symbol not in current]
+    return changed, removed
+
+
+def normalize_symbol(symbol):
+    """
+    Clients may say "btc" or "BTC_CAD", the snapshot rows always say "BTC_CAD"
+    """
+    symbol = symbol.upper()
+    return symbol if symbol.endswith(SYMBOL_SUFFIX) else f"{symbol}{SYMBOL_SUFFIX}"
+
+
+def normalize_symbols(symbols):
+    return frozenset(normalize_symbol(symbol) for symbol in symbols if isinstance(symbol, str))
+
+
+class BroadcastHub:
+    """
+    Keeps the latest snapshot per vs_currency and fans every new snapshot out to the subscribed client queues.
+
+    Clients either watch every symbol or a set of symbols. Watched symbols are indexed symbol -> client queues, so a
+    tick only touches the clients watching a symbol that changed, and clients watching the same set share one
+    encoded message.
+    """
+
+    def __init__(self):
+        self.subscribers = defaultdict(set)  # vs_currency : set of client queues watching every symbol
+        self.watchers = defaultdict(lambda: defaultdict(set))  # vs_currency : {symbol : set of client queues}
+        self.watching = {}  # client queue : (vs_currency, frozenset of symbols or None for every symbol)
+        self.latest = {}  # vs_currency : latest published snapshot
+        self.latest_by_symbol = {}  # vs_currency : {symbol : asset} of the latest snapshot
+        self.latest_rank = {}  # vs_currency : {symbol : position in the latest snapshot}
+        self.latest_tick = {}  # vs_currency : latest snapshot as a full tick, with its encoded messages
+        self.latest_fx = {}  # vs_currency : FX info of the latest snapshot
+        self.symbol_table = SymbolTable()  # Shared by every "packed" client
+
+    def _filtered(self, vs_currency, symbols):
+        """
+        Rows of the latest snapshot for symbols, in snapshot (bid) order
+        """
+        current = self.latest_by_symbol.get(vs_currency, {})
+        rank = self.latest_rank.get(vs_currency, {})
+        return [current[s] for s in sorted((s for s in symbols if s in current), key=rank.get)]
+
+    def subscribe(self, queue, vs_currency="cad", snapshot=None, symbols=None, fx=None):
+        """
+        Moves a client queue onto vs_currency, watching symbols (None for every symbol), and queues snapshot (or the
+        latest published one) so the client does not wait a full tick. fx describes snapshot's rate when it was not
+        published through the hub.
+        """
+        self.unsubscribe(queue)
+        self.watching[queue] = (vs_currency, symbols)
+        if symbols is None:
+            self.subscribers[vs_currency].add(queue)
+        else:
+            for symbol in symbols:
+                self.watchers[vs_currency][symbol].add(queue)
+
+        if symbols is not None:
+            if vs_currency in self.latest:
+                queue.put_nowait(
+                    Tick(
+                        vs_currency,
+                        self._filtered(vs_currency, symbols),
+                        symbol_table=self.symbol_table,
+                        fx=self.latest_fx.get(vs_currency),
+                    )
+                )
+        elif snapshot is None or snapshot is self.latest.get(vs_currency):
+            tick = self.latest_tick.get(vs_currency)  # Already encoded by the producer
+            if tick is not None:
+                queue.put_nowait(tick)
+        else:
+            queue.put_nowait(
+                Tick(vs_currency, snapshot, symbol_table=self.symbol_table, fx=fx or self.latest_fx.get(vs_currency))
+            )
+
+    def unwatch(self, queue, symbols):
+        """
+        Stops sending symbols to a client. A client watching every symbol is narrowed to the rest of the universe.
+        """
+        if queue not in self.watching:
+            return
+        vs_currency, watched = self.watching[queue]
+        if watched is None:
+            watched = frozenset(self.latest_by_symbol.get(vs_currency, {}))
+            self.subscribers[vs_currency].discard(queue)
+            for symbol in watched:
+                self.watchers[vs_currency][symbol].add(queue)
+        for symbol in symbols & watched:
+            self.watchers[vs_currency][symbol].discard(queue)
+            if not self.watchers[vs_currency][symbol]:
+                del self.watchers[vs_currency][symbol]
+        self.watching[queue] = (vs_currency, watched - symbols)
+
+    def unsubscribe(self, queue):
+        if queue not in self.watching:
+            return
+        vs_currency, watched = self.watching[queue]
+        if watched is None:
+            self.subscribers[vs_currency].discard(queue)
+        else:
+            self.unwatch(queue, watched)
+        del self.watching[queue]
+
+    def publish(self, vs_currency, data, fx=None):
+        """
+        Stores data as the latest snapshot and pushes it to every subscriber watching an asset that changed since the
+        last tick. fx describes the rate data was converted with.
+        """
+        with BROADCAST_SECONDS.time(vs_currency=vs_currency), span("publish", vs_currency=vs_currency):
+            self._publish(vs_currency, data, fx)
+
+    def _publish(self, vs_currency, data, fx):
+        current = {asset["symbol"]: asset for asset in data}
+        previous = self.latest_by_symbol.get(vs_currency)
+
+        if previous is None:
+            changed, removed = data, []
+            # First tick, everybody gets it all
+            tick = Tick(vs_currency, data, symbol_table=self.symbol_table, fx=fx, trace=current_trace())
+        else:
+            changed, removed = diff_assets(previous, current)
+            if not changed and not removed:
+                return  # Nothing changed, nothing to send
+            tick = Tick(vs_currency, data, changed, removed, self.symbol_table, fx=fx, trace=current_trace())
+
+        # Encode once here, in the producer, every subscriber gets the same text
+        tick.message("snapshot")
+        tick.message("delta")
+
+        self.latest[vs_currency] = data
+        self.latest_by_symbol[vs_currency] = current
+        self.latest_rank[vs_currency] = {asset["symbol"]: i for i, asset in enumerate(data)}
+        self.latest_fx[vs_currency] = fx
+        # Keep the full snapshot for new subscribers, sharing whatever is encoded already (more formats may follow)
+        self.latest_tick[vs_currency] = Tick(
+            vs_currency,
+            data,
+            symbol_table=self.symbol_table,
+            encoded=tick.encoded,
+            published_at=tick.published_at,
+            fx=fx,
+        )
+        for queue in self.subscribers[vs_currency]:
+            queue.put_nowait(tick)
+
+        self._publish_watched(vs_currency, tick, changed, removed)
+
+    def _publish_watched(self, vs_currency, tick, changed, removed):
+        """
+        Fans a tick out to clients watching a set of symbols, only visiting the symbols that changed
+        """
+        watchers = self.watchers.get(vs_currency)
+        if not watchers:
+            return
+
+        touched = defaultdict(lambda: ([], []))  # client queue : (changed rows, removed symbols)
+        for asset in changed:
+            for queue in watchers.get(asset["symbol"], ()):
+                touched[queue][0].append(asset)
+        for symbol in removed:
+            for queue in watchers.get(symbol, ()):
+                touched[queue][1].append(symbol)
+
+        # Clients watching the same set get the same rows, build and encode their tick once
+        ticks = {}
+        for queue, (rows, gone) in touched.items():
+            symbols = self.watching[queue][1]
+            if symbols not in ticks:
+                ticks[symbols] = Tick(
+                    vs_currency,
+                    self._filtered(vs_currency, symbols),
+                    None if tick.changed is None else rows,
+                    gone,
+                    self.symbol_table,
+                    published_at=tick.published_at,
+                    fx=tick.fx,
+                    trace=tick.trace,
+                )
+            queue.put_nowait(ticks[symbols])
+
+    def client_count(self):
+        return len(self.watching)
+
+    def client_stats(self):
+        """
+        Backpressure metrics of every subscribed client queue that keeps them (see backpressure.ClientQueue)
+        """
+        return [queue.stats() for queue in self.watching if hasattr(queue, "stats")]
+
+
+# Background task that refreshes the snapshot cache once per tick for one currency and publishes to the hub
+# recorders (tick store, candles, ...) get every fetched snapshot through record(vs_currency, assets, timestamp)
+async def run_producer(hub, cache, currencies=VS_CURRENCIES, interval=POLL_INTERVAL, recorders=()):
+    while True:
+        try:
+            with tracer.trace("tick"):  # Sampled at TRACE_SAMPLE_RATE, see tracing.py
+                base = await cache.refresh(BASE_CURRENCY)  # The only upstream fetch of the tick
+                fetched_at = int(time.time())
+                for vs_currency in currencies:
+                    if vs_currency not in fx_rates:
+                        print(f"No FX rate for {vs_currency}, skipping it this tick")
+                        continue
+                    data = derive_assets(base, vs_currency)
+                    hub.publish(vs_currency, data, fx_rates.info(vs_currency))
+                    with span("record", vs_currency=vs_currency):
+                        for recorder in recorders:
+                            try:
+                                recorder.record(vs_currency, data, fetched_at)
+                            except Exception as e:
+                                # Persistence failing (full disk, too many open files) must not stop live delivery
+                                RECORDER_ERRORS.inc(recorder=type(recorder).__name__)
+                                print(f"Error recording {vs_currency} in {type(recorder).__name__}: {e}")
+        except Exception as e:
+            PRODUCER_ERRORS.inc()
+            print(f"Error fetching data: {e}")
+        # Slow down when the CoinGecko quota runs low or we were told to back off
+        await asyncio.sleep(scheduler.next_interval(interval))
@@ -0,0 +1,80 @@
+"""
+The purpose of this file is to stop recomputing get_assets() from a fresh network call every time somebody asks for it.
+
+SnapshotCache holds the snapshot of the producer's latest tick per key and makes sure there is only ever one load per
+key in flight:
+1) the producer calls refresh() once per tick, that is the only load that reaches upstream
+2) get() returns the latest loaded snapshot, or joins the load in flight when there is none yet (a client subscribing
+before the first tick waits on the producer's fetch instead of starting its own)
+
+There is no TTL. Clients read published data from the hub, so a snapshot never gets refreshed outside of a tick and
+every reader sees the data the hub's deltas are based on.
+
+On /metrics: snapshot_cache_requests_total (get() served from the cache or joining a load), snapshot_cache_loads_total
+(by outcome) and snapshot_cache_age_seconds per key, which grows past the poll interval when the producer stalls.
+"""
+
+# Imports
+import asyncio
+import time
+
+from api import get_base_snapshot
+from metrics import registry
+
+REQUESTS = registry.counter(
+    "snapshot_cache_requests_total", "Snapshot cache reads, hit or join (waited on the load in flight)", ("outcome",)
+)
+LOADS = registry.counter("snapshot_cache_loads_total", "Snapshot cache loads, by outcome", ("outcome",))
+
+
+class SnapshotCache:
+    def __init__(self, loader):
+        self.loader = loader  # Coroutine function vs_currency -> snapshot
+        self.entries = {}  # vs_currency : latest snapshot
+        self.refreshing = {}  # vs_currency : in-flight refresh task
+        self.loaded_at = {}  # vs_currency : monotonic time of the latest load
+
+    async def _load(self, vs_currency):
+        try:
+            snapshot = await self.loader(vs_currency)
+        except Exception:
+            LOADS.inc(outcome="error")
+            raise
+        finally:
+            del self.refreshing[vs_currency]
+        LOADS.inc(outcome="ok")
+        self.entries[vs_currency] = snapshot
+        self.loaded_at[vs_currency] = time.monotonic()
+        return snapshot
+
+    def refresh(self, vs_currency):
+        """
+        Starts a refresh unless one is already running and returns its task, so there is one load per currency at a time
+        """
+        task = self.refreshing.get(vs_currency)
+        if task is None:
+            task = asyncio.create_task(self._load(vs_currency))
+            # A failed load may have nobody awaiting it, mark its error as seen
+            task.add_done_callback(lambda done: done.cancelled() or done.exception())
+            self.refreshing[vs_currency] = task
+        return task
+
+    async def get(self, vs_currency="cad"):
+        snapshot = self.entries.get(vs_currency)
+        if snapshot is None:
+            REQUESTS.inc(outcome="join")
+            # Shield so a cancelled reader does not cancel the load other readers wait on
+            return await asyncio.shield(self.refresh(vs_currency))
+        REQUESTS.inc(outcome="hit")
+        return snapshot
+
+    def ages(self):
+        """
+        Seconds since each key was last loaded, {(vs_currency,) : age} for the /metrics callback
+        """
+        now = time.monotonic()
+        return {(vs_currency,): now - loaded_at for vs_currency, loaded_at in self.loaded_at.items()}
+
+
+# Shared by the producer and every WebSocket client. Holds BASE_CURRENCY MarketSnapshots, other currencies are derived
+snapshot_cache = SnapshotCache(get_base_snapshot)
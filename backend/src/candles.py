@@ -0,0 +1,126 @@
+"""
+The purpose of this file is to build 1m/5m/1h candles per symbol as the snapshots arrive, instead of rescanning raw
+tick history.
+
+CandleAggregator is fed every snapshot the producers fetch and keeps one open candle per vs_currency, symbol and
+interval. Each tick is O(1) per symbol and interval: move high/low/close and count the tick. When a tick lands in a
+new interval the open candle is closed and appended to a memory-mapped ring (tickstore.RingTable, one file per
+vs_currency and interval) under CANDLE_STORE_DIR, so range queries read closed candles directly and never touch raw
+ticks. The open candle is written to its symbol's slot on every tick, so a restart carries on with the same
+open/high/low instead of starting the interval again. The mapped file is also how other workers see it: with
+MULTI_WORKER, followers open the files readonly and read the producer's open candle from there.
+
+Snapshots from /coins/markets carry no per-interval traded volume, so the volume column is the number of ticks that
+went into the candle.
+"""
+
+# Imports
+import math
+from pathlib import Path
+
+import numpy as np
+from tickstore import RingTable, safe_name
+
+# Interval name : seconds
+INTERVALS = {"1m": 60, "5m": 300, "1h": 3600}
+
+# Interval name : seconds of closed candles kept
+RETENTION = {"1m": 7 * 24 * 3600, "5m": 30 * 24 * 3600, "1h": 365 * 24 * 3600}
+
+CANDLE_DTYPE = np.dtype(
+    [
+        ("start", "<i8"),  # Unix Epoch seconds the interval starts at
+        ("open", "<f8"),
+        ("high", "<f8"),
+        ("low", "<f8"),
+        ("close", "<f8"),
+        ("volume", "<i8"),  # Ticks in the candle
+    ]
+)
+
+
+class CandleAggregator:
+    def __init__(self, directory, readonly=False):
+        self.directory = Path(directory)
+        self.readonly = readonly
+        self.open_candles = {}  # (vs_currency, symbol, interval) : [start, open, high, low, close, volume]
+        self.tables = {}  # (vs_currency, interval) : RingTable of closed candles, each slot's pending is its open candle
+
+    def _path(self, vs_currency, interval):
+        return self.directory / safe_name(vs_currency) / f"{interval}.candles"
+
+    def table(self, vs_currency, interval):
+        key = (vs_currency, interval)
+        if key not in self.tables:
+            capacity = math.ceil(RETENTION[interval] / INTERVALS[interval])
+            self.tables[key] = RingTable(
+                self._path(*key), capacity, CANDLE_DTYPE, pending=True, readonly=self.readonly
+            )
+        return self.tables[key]
+
+    def writable(self):
+        """
+        Reopens the tables read-write, once this worker is elected producer
+        """
+        self.tables = {}
+        self.open_candles = {}
+        self.readonly = False
+
+    def update(self, vs_currency, symbol, price, timestamp):
+        for interval, seconds in INTERVALS.items():
+            table = self.table(vs_currency, interval)
+            key = (vs_currency, symbol, interval)
+            start = timestamp - timestamp % seconds
+            candle = self.open_candles.get(key)
+            if candle is None:
+                candle = open_candle(table.pending(symbol))  # Left open by the previous run, if any
+
+            if candle is None or start > candle[0]:
+                if candle is not None:
+                    # Interval boundary crossed, persist the finished candle
+                    table.append(symbol, np.array([tuple(candle)], dtype=CANDLE_DTYPE))
+                candle = [start, price, price, price, price, 1]
+            else:
+                candle[2] = max(candle[2], price)
+                candle[3] = min(candle[3], price)
+                candle[4] = price
+                candle[5] += 1
+            self.open_candles[key] = candle
+            table.set_pending(symbol, tuple(candle))  # Survives a restart
+
+    def record(self, vs_currency, assets, timestamp):
+        """
+        Feeds one snapshot, the spot price of each asset is the traded price of the tick
+        """
+        for asset in assets:
+            self.update(vs_currency, asset["symbol"], asset["spot"], timestamp)
+
+    def read(self, vs_currency, symbol, interval, start=None, end=None):
+        """
+        Closed candles with start <= candle start < end as zero-copy views, plus the open candle (or None) if it is
+        inside the range
+        """
+        if (vs_currency, interval) not in self.tables and not self._path(vs_currency, interval).exists():
+            return [], None
+        table = self.table(vs_currency, interval)
+        closed = table.read(symbol, start, end, key="start")
+
+        current = open_candle(table.pending(symbol))
+        if current is not None and (start is None or current[0] >= start) and (end is None or current[0] < end):
+            current = dict(zip(CANDLE_DTYPE.names, current))
+        else:
+            current = None
+        return closed, current
+
+    def flush(self):
+        for table in self.tables.values():
+            table.flush()
+
+
+def open_candle(record):
+    """
+    [start, open, high, low, close, volume] of a stored pending record, None if there is no open candle
+    """
+    if record is None or record["volume"] == 0:
+        return None
+    return list(record.tolist())
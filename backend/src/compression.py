@@ -0,0 +1,83 @@
+"""
+The purpose of this file is to make compression opt-in and tunable for both the rates WebSocket and HTTP responses.
+Snapshots repeat the same keys and symbols on every tick, so they compress extremely well.
+
+1) WebSocket: permessage-deflate with a tunable level, window size and context takeover. Context takeover keeps a
+zlib window per connection between messages (much better ratio on repeated snapshots, ~300KB of memory per client).
+Without WS_DEFLATE the server keeps uvicorn's own setting (permessage-deflate with default settings unless
+ws_per_message_deflate is off), WS_DEFLATE only swaps in the tuned settings.
+2) HTTP: gzip for "/", the /frontend static files and JSON endpoints above a minimum size.
+
+Settings come from .env, see benchmarks/bench_compression.py for the bytes saved against CPU spent per setting:
+WS_DEFLATE, WS_DEFLATE_LEVEL, WS_DEFLATE_CONTEXT_TAKEOVER, WS_DEFLATE_WINDOW_BITS, HTTP_GZIP, HTTP_GZIP_LEVEL,
+HTTP_GZIP_MIN_SIZE
+
+uvicorn only accepts a custom WebSocket protocol from Python, so the WS settings apply when running "python app.py".
+With the uvicorn CLI use --ws-per-message-deflate instead (default settings only).
+"""
+
+# Imports
+import os
+
+from starlette.middleware.gzip import GZipMiddleware
+from uvicorn.protocols.websockets.websockets_impl import WebSocketProtocol
+from websockets.extensions.permessage_deflate import ServerPerMessageDeflateFactory
+
+
+def env_flag(name, default=False):
+    value = os.getenv(name)
+    return default if not value else value.strip().lower() in ("1", "true", "yes", "on")
+
+
+WS_DEFLATE = env_flag("WS_DEFLATE")
+WS_DEFLATE_LEVEL = int(os.getenv("WS_DEFLATE_LEVEL") or 6)
+WS_DEFLATE_CONTEXT_TAKEOVER = env_flag("WS_DEFLATE_CONTEXT_TAKEOVER", default=True)
+WS_DEFLATE_WINDOW_BITS = int(os.getenv("WS_DEFLATE_WINDOW_BITS") or 15)
+
+HTTP_GZIP = env_flag("HTTP_GZIP")
+HTTP_GZIP_LEVEL = int(os.getenv("HTTP_GZIP_LEVEL") or 6)
+HTTP_GZIP_MIN_SIZE = int(os.getenv("HTTP_GZIP_MIN_SIZE") or 1000)  # Bytes, smaller bodies are not worth it
+
+
+def deflate_factory():
+    """
+    permessage-deflate as configured in .env. memLevel follows the window so small windows really save memory.
+    """
+    return ServerPerMessageDeflateFactory(
+        server_no_context_takeover=not WS_DEFLATE_CONTEXT_TAKEOVER,
+        server_max_window_bits=WS_DEFLATE_WINDOW_BITS,
+        compress_settings={
+            "level": WS_DEFLATE_LEVEL,
+            "memLevel": max(1, min(8, WS_DEFLATE_WINDOW_BITS - 7)),
+        },
+    )
+
+
+class TunedWebSocketProtocol(WebSocketProtocol):
+    """
+    uvicorn's websockets protocol with our permessage-deflate settings instead of its defaults when WS_DEFLATE is on
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if WS_DEFLATE:
+            self.available_extensions = [deflate_factory()]
+
+
+def vary_header(request, body=b""):
+    """
+    Vary header for a response GZipMiddleware sends uncompressed, it adds the header itself to the ones it compresses.
+    Empty without HTTP_GZIP, the body never depends on Accept-Encoding then.
+    """
+    if not HTTP_GZIP:
+        return {}
+    if "gzip" in request.headers.get("accept-encoding", "") and len(body) >= HTTP_GZIP_MIN_SIZE:
+        return {}
+    return {"Vary": "Accept-Encoding"}
+
+
+def add_http_compression(app):
+    if HTTP_GZIP:
+        app.add_middleware(
+            GZipMiddleware, minimum_size=HTTP_GZIP_MIN_SIZE, compresslevel=HTTP_GZIP_LEVEL
+        )
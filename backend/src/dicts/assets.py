@@ -1,77 +0,0 @@
-ASSETS = [
-    "BTC",
-    "ETH",
-    "LTC",
-    "XRP",
-    "BCH",
-    "USDC",
-    "XMR",
-    "XLM",
-    "USDT",
-    "QCAD",
-    "DOGE",
-    "LINK",
-    "MATIC",
-    "UNI",
-    "COMP",
-    "AAVE",
-    "DAI",
-    "SUSHI",
-    "SNX",
-    "CRV",
-    "DOT",
-    "YFI",
-    "MKR",
-    "PAXG",
-    "ADA",
-    "BAT",
-    "ENJ",
-    "AXS",
-    "DASH",
-    "EOS",
-    "BAL",
-    "KNC",
-    "ZRX",
-    "SAND",
-    "GRT",
-    "QNT",
-    "ETC",
-    "ETHW",
-    "1INCH",
-    "CHZ",
-    "CHR",
-    "SUPER",
-    "ELF",
-    "OMG",
-    "FTM",
-    "MANA",
-    "SOL",
-    "ALGO",
-    "LUNC",
-    "USTC",
-    "ZEC",
-    "XTZ",
-    "AMP",
-    "REN",
-    "UMA",
-    "SHIB",
-    "LRC",
-    "ANKR",
-    "HBAR",
-    "EGLD",
-    "AVAX",
-    "ONE",
-    "GALA",
-    "ALICE",
-    "ATOM",
-    "DYDX",
-    "CELO",
-    "STORJ",
-    "SKL",
-    "CTSI",
-    "BAND",
-    "ENS",
-    "RENDER",
-    "MASK",
-    "APE",
-]
@@ -1,8 +1,12 @@
 """
-The purpose of this file is to provide immutable dicts that do not change for the purpose of this simulation. We fetch two dicts:
+The purpose of this file is to refresh the asset file (assets.csv) that the asset registry (src>assets.py) serves.
+For every symbol already listed in it, we fetch:
 
-1) symbol_price_dict: contains dict of symbol : initial_value_CAD for desired coins
-2) symbol_id_dict: contains dict of symbol : id for desired coins
+1) baseline_price_cad: the initial_value_CAD of the coin
+2) coingecko_id: the id of the coin
+
+The running server picks the new file up on its next tick, no restart needed. To track another coin, add a row with its
+symbol (the id and price can stay empty) and run this file.
 
 
 This is to speed up processing time in the assets.py file where we make an API call to GeckoCoin API. This occurs because dict:
@@ -17,11 +21,10 @@ To see how this was initially done, refer to old>inefficient_api.py, it was heck
 """
 
 # Imports
-import json
+import csv
 import os
 
 import requests
-from assets import ASSETS
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -55,6 +58,12 @@ def fetch_id_price():
     return all_assets
 
 
+# Path to the asset file, rewritten in place
+assets_file = os.path.join("backend", "src", "dicts", "assets.csv")
+with open(assets_file, newline="") as f:
+    # symbol : current row, in file order. Coins missing from the response keep their current id and price
+    ASSETS = {row["symbol"].strip().upper(): row for row in csv.DictReader(f) if row.get("symbol")}
+
 data = fetch_id_price()
 
 # Dictionaries to store values
@@ -68,14 +77,17 @@ for coin in data:
             symbol_price_dict[symbol] = coin.get("current_price", "")
             symbol_id_dict[symbol] = coin.get("id", "")
 
-# Paths to the Python files to be created
-symbol_price_dict_file = os.path.join("backend", "src", "dicts", "symbol_price_dict.py")
-symbol_id_dict_file = os.path.join("backend", "src", "dicts", "symbol_id_dict.py")
-
-# Save symbol_price_dict as a Python file with cleaner formatting
-with open(symbol_price_dict_file, "w") as f:
-    f.write(f"symbol_price_dict = {json.dumps(symbol_price_dict, indent=4)}\n")
-
-# Save symbol_id_dict as a Python file with cleaner formatting
-with open(symbol_id_dict_file, "w") as f:
-    f.write(f"SYMBOL_ID_DICT = {json.dumps(symbol_id_dict, indent=4)}\n")
+# Write the whole file next to assets.csv and rename it over, so the server never reads half a file
+temporary_file = assets_file + ".tmp"
+with open(temporary_file, "w", newline="") as f:
+    writer = csv.writer(f, lineterminator="\n")
+    writer.writerow(["symbol", "coingecko_id", "baseline_price_cad"])
+    for symbol, row in ASSETS.items():
+        writer.writerow(
+            [
+                symbol,
+                symbol_id_dict.get(symbol, row.get("coingecko_id", "")),
+                symbol_price_dict.get(symbol, row.get("baseline_price_cad", "")),
+            ]
+        )
+os.replace(temporary_file, assets_file)
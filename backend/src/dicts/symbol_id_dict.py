@@ -1,79 +0,0 @@
-SYMBOL_ID_DICT = {
-    "BTC": "bitcoin",
-    "ETH": "ethereum",
-    "LTC": "litecoin",
-    "XRP": "ripple",
-    "BCH": "bitcoin-cash",
-    "USDC": "usd-coin",
-    "XMR": "monero",
-    "XLM": "stellar",
-    "USDT": "tether",
-    "QCAD": "qcad",
-    "DOGE": "dogecoin",
-    "LINK": "chainlink",
-    "MATIC": "matic-network",
-    "UNI": "uniswap",
-    "COMP": "compound-governance-token",
-    "AAVE": "aave",
-    "DAI": "dai",
-    "SUSHI": "sushi",
-    "SNX": "synthetix-network-token",
-    "CRV": "curve-dao-token",
-    "DOT": "polkadot",
-    "YFI": "yearn-finance",
-    "MKR": "maker",
-    "PAXG": "pax-gold",
-    "ADA": "cardano",
-    "BAT": "basic-attention-token",
-    "ENJ": "enjincoin",
-    "AXS": "axie-infinity",
-    "DASH": "dash",
-    "EOS": "eos",
-    "BAL": "balancer",
-    "KNC": "kyber-network-crystal",
-    "ZRX": "0x",
-    "SAND": "the-sandbox",
-    "GRT": "the-graph",
-    "QNT": "quant-network",
-    "ETC": "ethereum-classic",
-    "ETHW": "ethereum-pow",
-    "1INCH": "1inch",
-    "CHZ": "chiliz",
-    "CHR": "chromaway",
-    "SUPER": "superfarm",
-    "ELF": "aelf",
-    "OMG": "omg-network",
-    "FTM": "fantom",
-    "MANA": "decentraland",
-    "SOL": "solana",
-    "ALGO": "algorand",
-    "LUNC": "terra-luna",
-    "USTC": "terrausd",
-    "ZEC": "zcash",
-    "XTZ": "tezos",
-    "AMP": "amp-token",
-    "REN": "ren",
-    "UMA": "uma",
-    "SHIB": "shiba-inu",
-    "LRC": "loopring",
-    "ANKR": "ankr",
-    "HBAR": "hedera-hashgraph",
-    "EGLD": "elrond-erd-2",
-    "AVAX": "avalanche-2",
-    "ONE": "harmony",
-    "GALA": "gala",
-    "ALICE": "my-neighbor-alice",
-    "ATOM": "cosmos",
-    "DYDX": "dydx",
-    "CELO": "celo",
-    "STORJ": "storj",
-    "SKL": "skale",
-    "CTSI": "cartesi",
-    "BAND": "band-protocol",
-    "ENS": "ethereum-name-service",
-    "RENDER": "render-token",
-    "MASK": "mask-network",
-    "APE": "apecoin",
-}
-
-id_values = list(SYMBOL_ID_DICT.values())
@@ -1,77 +0,0 @@
-symbol_price_dict = {
-    "BTC": 87106.0,
-    "ETH": 3554.48,
-    "LTC": 91.49,
-    "XRP": 0.869411,
-    "BCH": 467.72,
-    "USDC": 1.35,
-    "XMR": 208.78,
-    "XLM": 0.137302,
-    "USDT": 1.35,
-    "QCAD": 0.7449,
-    "DOGE": 0.165431,
-    "LINK": 16.54,
-    "MATIC": 0.3959,
-    "UNI": 7.41,
-    "COMP": 1.55e-06,
-    "AAVE": 214.26,
-    "DAI": 1.35,
-    "SUSHI": 1.14,
-    "SNX": 1.58,
-    "CRV": 0.399365,
-    "DOT": 6.32,
-    "YFI": 7384.08,
-    "MKR": 2189.03,
-    "PAXG": 3572.49,
-    "ADA": 0.52554,
-    "BAT": 0.253348,
-    "ENJ": 0.238071,
-    "AXS": 7.16,
-    "DASH": 33.76,
-    "EOS": 0.720844,
-    "BAL": 2.88,
-    "KNC": 0.669841,
-    "ZRX": 0.47136,
-    "SAND": 0.385704,
-    "GRT": 0.250554,
-    "QNT": 100.77,
-    "ETC": 27.05,
-    "ETHW": 3.68,
-    "1INCH": 0.39503,
-    "CHZ": 0.091365,
-    "CHR": 0.005509,
-    "SUPER": 1.44,
-    "ELF": 0.567184,
-    "OMG": 0.396256,
-    "FTM": 0.905551,
-    "MANA": 0.431826,
-    "SOL": 210.88,
-    "ALGO": 0.186333,
-    "LUNC": 0.00013074,
-    "USTC": 0.03096922,
-    "ZEC": 38.64,
-    "XTZ": 0.993928,
-    "AMP": 0.00575292,
-    "REN": 2655.82,
-    "UMA": 3.61,
-    "SHIB": 2.509e-05,
-    "LRC": 0.184485,
-    "ANKR": 0.04006059,
-    "HBAR": 0.080697,
-    "EGLD": 38.62,
-    "AVAX": 27.82,
-    "ONE": 0.01940168,
-    "GALA": 0.03215058,
-    "ALICE": 0.009958,
-    "ATOM": 6.63,
-    "DYDX": 1.45,
-    "CELO": 0.870339,
-    "STORJ": 0.565466,
-    "SKL": 0.057089,
-    "CTSI": 0.189439,
-    "BAND": 1.75,
-    "ENS": 25.87,
-    "RENDER": 8.91,
-    "MASK": 3.17,
-    "APE": 1.12,
-}
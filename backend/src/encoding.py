@@ -0,0 +1,35 @@
+"""
+The purpose of this file is to serialize outgoing messages once, compactly, and as fast as the installed libraries allow.
+
+send_fresh_data used to run json.dumps(..., indent=4) inside every connection, so one snapshot was serialized once per
+client per tick, and the indentation made every payload much bigger. encode() produces compact JSON text that the
+producer builds once and hands to every subscriber. orjson is used when it is installed, otherwise the stdlib json module.
+"""
+
+# Imports
+import json
+
+try:
+    import orjson  # Optional, noticeably faster than json for big snapshots
+except ImportError:
+    orjson = None
+
+JSON_BACKEND = "orjson" if orjson is not None else "json"
+
+
+def encode(message):
+    """
+    Returns message as compact JSON text (no indentation, no spaces after separators)
+    """
+    if orjson is not None:
+        return orjson.dumps(message).decode()
+    return json.dumps(message, separators=(",", ":"))
+
+
+def decode(payload):
+    """
+    Parses JSON text or bytes produced by encode()
+    """
+    if orjson is not None:
+        return orjson.loads(payload)
+    return json.loads(payload)
@@ -0,0 +1,162 @@
+"""
+The purpose of this file is to keep a full FX rate table fresh without ever blocking the event loop, and to remember
+the last table that worked.
+
+api.py used to ask forex_python for a single CAD -> USD rate once, and fell back to a hard-coded 1.3 forever if that
+call failed. FxRates instead:
+
+1) refreshes the whole base-currency table on a schedule, from the same source forex_python reads but through httpx
+with a timeout (forex_python's requests.get has none, a stalled FX service used to hang its worker thread for good)
+2) keeps it in memory, so deriving a currency is a dict lookup
+3) writes every good table to disk (atomically), so restarts and offline runs start from realistic rates instead of
+the built-in placeholders
+4) knows how old its rates are, so every response can say so
+
+Settings come from .env: FX_REFRESH_SECONDS, FX_RATES_FILE (backend/data/fx_rates.json by default)
+"""
+
+# Imports
+import asyncio
+import json
+import os
+import time
+from pathlib import Path
+
+# Seconds between two refreshes, the upstream table itself only moves about once a day
+DEFAULT_REFRESH_SECONDS = 3600
+
+# Seconds before retrying after a failed refresh
+RETRY_SECONDS = 60
+
+# The latest table, the endpoint forex_python's CurrencyRates().get_rates() calls
+FX_URL = "https://theforexapi.com/api/latest"
+FETCH_TIMEOUT = 10.0  # Seconds, 5 of them to connect
+
+
+def new_client():
+    import httpx  # Imported on first use, like in api.py
+
+    return httpx.AsyncClient(timeout=httpx.Timeout(FETCH_TIMEOUT, connect=5.0))
+
+
+async def fetch_rates(base):
+    """
+    Upstream fetch, {currency : units per 1 base}
+    """
+    # Built in a worker thread like api.get_client(), loading the CA bundle would stall the event loop
+    async with await asyncio.to_thread(new_client) as client:
+        response = await client.get(FX_URL, params={"base": base.upper(), "rtype": "fpy"})
+    response.raise_for_status()
+    return response.json()["rates"]
+
+
+class FxRates:
+    """
+    Rate table of units of each currency per 1 base currency, usable like a read-only dict
+    """
+
+    def __init__(self, base, path, defaults, fetch=fetch_rates):
+        self.base = base
+        self.path = Path(path)
+        self.fetch = fetch
+        self.rates = {**defaults, base: 1.0}
+        self.as_of = None  # Epoch seconds the table was fetched upstream, None for the built-in placeholders
+        self.source = "default"  # "default", "disk" (last known good table) or "live"
+        self.failures = 0
+        self.mtime = None  # st_mtime_ns of the file last loaded
+        self.load_if_changed()
+
+    def __contains__(self, currency):
+        return currency in self.rates
+
+    def __getitem__(self, currency):
+        return self.rates[currency]
+
+    def age(self):
+        """
+        Seconds since the table was fetched upstream, None while running on the built-in placeholders
+        """
+        return None if self.as_of is None else max(0.0, time.time() - self.as_of)
+
+    def info(self, currency):
+        """
+        What a response needs to say about the rate it was converted with
+        """
+        age = self.age()
+        return {
+            "base": self.base,
+            "rate": self.rates.get(currency),
+            "as_of": self.as_of,
+            "age": None if age is None else round(age, 1),
+            "source": self.source,
+        }
+
+    def update(self, rates, as_of):
+        self.rates.update({currency.lower(): float(rate) for currency, rate in rates.items() if float(rate) > 0})
+        self.rates[self.base] = 1.0
+        self.as_of = as_of
+
+    def load(self):
+        """
+        Starts from the last known good table on disk, if there is a readable one for this base currency
+        """
+        try:
+            stored = json.loads(self.path.read_text())
+            if stored["base"] != self.base:
+                return
+            self.update(stored["rates"], float(stored["as_of"]))
+        except FileNotFoundError:
+            return
+        except (KeyError, TypeError, ValueError) as e:
+            print(f"Ignoring unreadable FX table {self.path}: {e}")
+            return
+        self.source = "disk"
+
+    def load_if_changed(self):
+        """
+        Loads the table on disk again if it was rewritten since the last load, one stat() otherwise
+        """
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return False
+        if mtime == self.mtime:
+            return False
+        self.mtime = mtime
+        self.load()
+        return True
+
+    def save(self):
+        """
+        Writes the table next to its final path and renames it over, so a crash never leaves half a file behind
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = self.path.with_suffix(".tmp")
+        temporary.write_text(json.dumps({"base": self.base, "as_of": self.as_of, "rates": self.rates}))
+        os.replace(temporary, self.path)
+
+    async def refresh(self):
+        """
+        Fetches a new table. Returns False (and keeps the current table) if the fetch failed or returned garbage.
+        """
+        try:
+            rates = await self.fetch(self.base)
+            self.update(rates, time.time())
+        except Exception as e:
+            self.failures += 1
+            print(f"Keeping FX rates from {self.source}, fetch failed due to: {e}")
+            return False
+        self.source = "live"
+        try:
+            self.save()
+        except OSError as e:
+            print(f"Could not save FX table to {self.path}: {e}")
+        return True
+
+    async def run(self, interval=DEFAULT_REFRESH_SECONDS):
+        """
+        Background task started with the app lifespan, refreshes every interval and retries sooner after a failure
+        """
+        while True:
+            ok = await self.refresh()
+            await asyncio.sleep(interval if ok else min(interval, RETRY_SECONDS))
@@ -0,0 +1,206 @@
+"""
+The purpose of this file is to replace print() as our only telemetry with numbers a Prometheus server can scrape from
+the /metrics endpoint.
+
+A tiny registry of counters, gauges and histograms rendered in the Prometheus text format (version 0.0.4), with no
+dependency to install. Recording is a dict update (plus a bisect for histograms), rendering only happens when /metrics
+is scraped, so it stays on in production. Values that already live elsewhere (connected clients, queue depths, quota)
+are read at scrape time through callbacks instead of being copied on every change.
+
+Metrics are per process. With MULTI_WORKER (see shared.py) only the elected producer records upstream and transform
+metrics, scrape every worker.
+"""
+
+# Imports
+import bisect
+import math
+import time
+from contextlib import contextmanager
+
+# Seconds, from a fast local transform up to a slow upstream call
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in pairs) + "}"
+
+
+def format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.values = {}  # label values tuple : value
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labels)
+
+    def samples(self):
+        for key, value in self.values.items():
+            yield self.name, key, (), value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for name, key, extra, value in self.samples():
+            lines.append(f"{name}{format_labels(self.labels, key, extra)} {format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        self.values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(set(buckets)))  # A bound given twice (e.g. CLIENT_QUEUE_SIZE=4) is one bucket
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        state = self.values.get(key)
+        if state is None:
+            state = self.values[key] = [[0] * len(self.buckets), 0.0, 0]  # per-bucket counts, sum, count
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            state[0][index] += 1
+        state[1] += value
+        state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        for key, (counts, total, count) in self.values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket", key, (("le", format_value(bound)),), cumulative
+            yield f"{self.name}_bucket", key, (("le", "+Inf"),), count
+            yield f"{self.name}_sum", key, (), total
+            yield f"{self.name}_count", key, (), count
+
+
+class Callback(Metric):
+    """
+    A gauge or counter whose values are read at scrape time. collect() returns a number, or a dict of label values
+    tuple : number.
+    """
+
+    def __init__(self, name, documentation, collect, labels=(), kind="gauge"):
+        super().__init__(name, documentation, labels)
+        self.collect = collect
+        self.kind = kind
+
+    def samples(self):
+        values = self.collect()
+        if not isinstance(values, dict):
+            values = {(): values}
+        for key, value in values.items():
+            if value is not None:
+                yield self.name, key, (), value
+
+
+class CallbackHistogram(Histogram):
+    """
+    A histogram rebuilt from the current values returned by collect() at every scrape, e.g. one queue depth per client
+    """
+
+    def __init__(self, name, documentation, collect, buckets):
+        super().__init__(name, documentation, buckets=buckets)
+        self.collect = collect
+
+    def samples(self):
+        self.values = {}
+        for value in self.collect():
+            self.observe(value)
+        if not self.values:
+            self.values[()] = [[0] * len(self.buckets), 0.0, 0]
+        return super().samples()
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}  # name : Metric
+
+    def register(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labels=()):
+        return self.register(Counter(name, documentation, labels))
+
+    def gauge(self, name, documentation, labels=()):
+        return self.register(Gauge(name, documentation, labels))
+
+    def histogram(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labels, buckets))
+
+    def render(self):
+        lines = []
+        for metric in self.metrics.values():
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+
+# Shared by every module, served by the /metrics endpoint in app.py
+registry = Registry()
+
+UPSTREAM_LATENCY = registry.histogram(
+    "upstream_request_seconds", "CoinGecko request latency per attempt", buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+UPSTREAM_RESPONSES = registry.counter(
+    "upstream_responses_total", "CoinGecko responses by HTTP status, 'error' for transport failures", ("status",)
+)
+SIMULATED_FALLBACK = registry.counter(
+    "simulated_fallback_total", "Tracked assets filled in by the synthetic market, per symbol", ("symbol",)
+)
+TRANSFORM_SECONDS = registry.histogram(
+    "transform_seconds", "Payload to snapshot (build) and per-currency derivation (derive) time", ("stage",)
+)
+SERIALIZED_BYTES = registry.counter(
+    "serialized_bytes_total", "Bytes of encoded messages, counted once per tick and not per client", ("format", "mode")
+)
+BROADCAST_SECONDS = registry.histogram(
+    "broadcast_publish_seconds", "Time for the hub to diff, encode and fan out one tick", ("vs_currency",)
+)
+PRODUCER_ERRORS = registry.counter("producer_errors_total", "Ticks the producer failed to fetch or publish")
+RECORDER_ERRORS = registry.counter(
+    "recorder_errors_total", "Snapshots a recorder (tick store, candles) failed to persist", ("recorder",)
+)
@@ -0,0 +1,63 @@
+"""
+The purpose of this file is to profile the live server on demand without restarting it or installing anything.
+
+SamplingProfiler runs in its own thread and, every interval, grabs the current stack of every other thread with
+sys._current_frames(). Stacks are counted in the "folded" format (root;caller;callee count per line) that
+flamegraph.pl, speedscope and most flame-graph viewers read. The event loop keeps running while it samples, so the
+profile shows what the server really spends time on under its current load.
+
+Served by /admin/profile in app.py, which is only enabled when ADMIN_TOKEN is set in .env.
+"""
+
+# Imports
+import os
+import sys
+import threading
+from collections import Counter
+
+MAX_SECONDS = 60
+DEFAULT_INTERVAL = 0.005  # Seconds between samples, ~200 samples per second
+
+
+def frame_name(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ":")
+
+
+class SamplingProfiler:
+    def __init__(self, interval=DEFAULT_INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()  # folded stack : samples
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        own = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(frame_name(frame))
+                frame = frame.f_back
+            stack.append(names.get(thread_id, f"thread-{thread_id}"))
+            self.stacks[";".join(reversed(stack))] += 1
+        self.samples += 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def folded(self):
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
@@ -0,0 +1,142 @@
+"""
+The purpose of this file is to spend our CoinGecko call quota on fresh data instead of on failed requests.
+
+1) TokenBucket: sized to the API plan (CoinGecko_Calls_Per_Minute in .env), every upstream call takes one token.
+2) UpstreamScheduler: waits for a token before each call, retries 429s and server errors with exponential backoff and
+jitter, honours Retry-After, and tells the producers how long to sleep so the poll rate adapts to the remaining quota.
+"""
+
+# Imports
+import asyncio
+import random
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+# Demo API plan allows 30 calls per minute
+DEFAULT_CALLS_PER_MINUTE = 30
+
+# Statuses worth retrying, anything else is returned to the caller as is
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """
+    Classic token bucket refilled continuously at rate_per_minute, holding at most capacity tokens
+    """
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60  # Tokens per second
+        self.capacity = capacity or rate_per_minute
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def remaining(self):
+        self._refill()
+        return self.tokens
+
+    def drain_to(self, tokens):
+        """
+        Lowers the bucket when the server reports less quota left than we think we have
+        """
+        self._refill()
+        self.tokens = min(self.tokens, float(tokens))
+
+    async def acquire(self):
+        # Sleep just long enough for the next token to arrive
+        while self.remaining() < 1:
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+        self.tokens -= 1
+
+
+def parse_retry_after(value):
+    """
+    Retry-After is either a number of seconds or an HTTP date, returns seconds to wait or None
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class UpstreamScheduler:
+    def __init__(
+        self,
+        calls_per_minute=DEFAULT_CALLS_PER_MINUTE,
+        max_retries=3,
+        base_backoff=1.0,
+        max_backoff=60.0,
+    ):
+        self.calls_per_minute = calls_per_minute
+        self.bucket = TokenBucket(calls_per_minute)
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.paused_until = 0.0  # Monotonic time before which no call is made (Retry-After)
+        self.rate_limited = 0  # Number of 429s seen, useful when tuning the plan size
+
+    def _backoff(self, attempt):
+        # Full jitter, so several producers do not retry in lockstep
+        return random.uniform(0, min(self.max_backoff, self.base_backoff * 2**attempt))
+
+    def _pause(self, seconds):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    async def request(self, send):
+        """
+        Calls send() (a coroutine function returning an httpx.Response) under the rate limit, retrying when it is
+        worth it. Raises the last error if every attempt failed.
+        """
+        import httpx  # Imported on first use, like in api.py
+
+        for attempt in range(self.max_retries + 1):
+            wait = self.paused_until - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            await self.bucket.acquire()
+
+            try:
+                response = await send()
+            except httpx.TransportError:
+                if attempt == self.max_retries:
+                    raise
+                await asyncio.sleep(self._backoff(attempt))
+                continue
+
+            # Keep the bucket honest if the server tells us how much quota is left
+            remaining = response.headers.get("x-ratelimit-remaining")
+            if remaining is not None and remaining.isdigit():
+                self.bucket.drain_to(int(remaining))
+
+            if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                return response
+
+            retry_after = parse_retry_after(response.headers.get("retry-after"))
+            if response.status_code == 429:
+                self.rate_limited += 1
+                print(f"Rate limited by CoinGecko, retry after {retry_after}s")
+            self._pause(retry_after if retry_after is not None else self._backoff(attempt))
+
+    def next_interval(self, base_interval, producers=1):
+        """
+        Seconds a producer should sleep before its next tick. Never faster than base_interval, slow enough that all
+        producers together stay inside the plan, slower still when the bucket runs low, and never before a Retry-After
+        pause ends.
+        """
+        interval = max(base_interval, producers * 60 / self.calls_per_minute)
+        if self.bucket.remaining() < self.bucket.capacity / 4:
+            interval *= 2  # Quota is running out, let the bucket refill
+        return max(interval, self.paused_until - time.monotonic())
+
@@ -0,0 +1,219 @@
+"""
+The purpose of this file is to let several uvicorn workers (--workers N, or WEB_WORKERS with "python app.py") share
+one upstream poller, so WebSocket connections scale across cores while CoinGecko still sees a single client.
+
+Without it every worker runs its own producer, FX refresh and hub, which multiplies upstream calls and rate-limit
+pressure by N. With MULTI_WORKER on:
+
+1) Election: every worker tries to take an exclusive lock on SHARED_DIR/producer.lock. The one that gets it runs the
+producer (and the FX refresh and the recorders), the others keep retrying, so a follower takes over within
+ELECTION_SECONDS when the producer dies (the OS drops the lock with the process).
+2) Hand-off: the producer writes every published snapshot into a memory-mapped mailbox per vs_currency
+(SHARED_DIR/<vs_currency>.snapshot). Followers poll the mailbox sequence numbers and publish new snapshots to their own
+hub, which fans them out to that worker's sockets exactly like a single-process run.
+
+Mailbox layout: HEADER (magic, capacity, sequence, length as int64) followed by capacity bytes of JSON
+{"data": [...], "fx": {...}}. The sequence is odd while a write is in progress (a seqlock), a reader that sees it odd
+or changed under it just tries again on the next poll.
+"""
+
+# Imports
+import asyncio
+import os
+from pathlib import Path
+
+import numpy as np
+from encoding import decode, encode
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+MAGIC = 0x504E5348  # "HSNP"
+HEADER_DTYPE = np.dtype("<i8")
+HEADER_FIELDS = 4  # magic, capacity, sequence, length
+HEADER_BYTES = HEADER_FIELDS * HEADER_DTYPE.itemsize
+
+DEFAULT_MAILBOX_BYTES = 8 * 1024 * 1024  # ~15,000 assets of JSON
+POLL_SECONDS = 0.05  # How often followers look for a new snapshot
+ELECTION_SECONDS = 1.0  # How often followers try to become the producer
+
+
+class ProducerLock:
+    """
+    Non-blocking exclusive file lock, held for as long as this process is the producer
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.file = None
+
+    @property
+    def held(self):
+        return self.file is not None
+
+    def try_acquire(self):
+        if self.file is not None:
+            return True
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        file = open(self.path, "a+b")
+        try:
+            if fcntl is not None:
+                fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                file.seek(0)
+                msvcrt.locking(file.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            file.close()
+            return False
+        self.file = file
+        return True
+
+    def release(self):
+        if self.file is None:
+            return
+        if fcntl is not None:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+        else:
+            self.file.seek(0)
+            msvcrt.locking(self.file.fileno(), msvcrt.LK_UNLCK, 1)
+        self.file.close()
+        self.file = None
+
+
+class Mailbox:
+    """
+    Latest snapshot of one vs_currency in a memory-mapped file, one writer and any number of readers
+    """
+
+    def __init__(self, path, capacity=DEFAULT_MAILBOX_BYTES):
+        self.path = Path(path)
+        self.capacity = capacity
+        self.header = None
+        self.body = None
+        self.seen = 0  # Sequence of the last snapshot this process read or wrote
+
+    def _map(self, create):
+        if self.header is not None:
+            return True
+        if create:
+            existing = None
+            if self.path.exists():
+                existing = np.fromfile(self.path, dtype=HEADER_DTYPE, count=HEADER_FIELDS)
+            if existing is None or len(existing) < HEADER_FIELDS or existing[0] != MAGIC or existing[1] != self.capacity:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.path, "wb") as f:
+                    f.truncate(HEADER_BYTES + self.capacity)
+                header = np.memmap(self.path, dtype=HEADER_DTYPE, mode="r+", shape=(HEADER_FIELDS,))
+                header[:] = (MAGIC, self.capacity, 0, 0)
+                header.flush()
+        elif not self.path.exists():
+            return False  # Nothing published yet
+
+        header = np.memmap(self.path, dtype=HEADER_DTYPE, mode="r+", shape=(HEADER_FIELDS,))
+        if header[0] != MAGIC:
+            return False  # Still being created by the producer
+        self.header = header
+        self.body = np.memmap(self.path, dtype=np.uint8, mode="r+", offset=HEADER_BYTES, shape=(int(header[1]),))
+        return True
+
+    def write(self, payload):
+        """
+        Publishes payload (bytes). Returns False if it does not fit, readers keep the previous snapshot.
+        """
+        self._map(create=True)
+        if len(payload) > len(self.body):
+            print(f"Snapshot of {len(payload):,} bytes does not fit {self.path}, raise SHARED_MAILBOX_BYTES")
+            return False
+        sequence = int(self.header[2])
+        self.header[2] = sequence + 1 + sequence % 2  # Odd, write in progress
+        self.body[: len(payload)] = np.frombuffer(payload, dtype=np.uint8)
+        self.header[3] = len(payload)
+        self.header[2] = int(self.header[2]) + 1  # Even again, complete
+        self.seen = int(self.header[2])
+        return True
+
+    def read(self):
+        """
+        The payload published since the last read, None if there is none (or a write is in progress)
+        """
+        if not self._map(create=False):
+            return None
+        sequence = int(self.header[2])
+        if sequence == self.seen or sequence % 2:
+            return None
+        payload = self.body[: int(self.header[3])].tobytes()
+        if int(self.header[2]) != sequence:
+            return None  # Overwritten while copying, take the next one
+        self.seen = sequence
+        return payload
+
+    def close(self):
+        self.header = self.body = None
+
+
+class SharedPublisher:
+    """
+    Stands in for the hub in run_producer: publishes locally and writes the snapshot to the mailbox for the followers
+    """
+
+    def __init__(self, hub, mailboxes):
+        self.hub = hub
+        self.mailboxes = mailboxes
+
+    def publish(self, vs_currency, data, fx=None):
+        self.hub.publish(vs_currency, data, fx)
+        self.mailboxes[vs_currency].write(encode({"data": data, "fx": fx}).encode())
+
+
+class WorkerCoordinator:
+    """
+    Runs in every worker. Elects the producer and, while this worker is a follower, copies new snapshots from the
+    mailboxes into the local hub.
+
+    start_producer(publisher) starts the producer tasks with publisher in place of the hub and returns them.
+    """
+
+    def __init__(self, directory, hub, currencies, start_producer, capacity=DEFAULT_MAILBOX_BYTES):
+        self.directory = Path(directory)
+        self.hub = hub
+        self.start_producer = start_producer
+        self.lock = ProducerLock(self.directory / "producer.lock")
+        self.mailboxes = {
+            vs_currency: Mailbox(self.directory / f"{vs_currency}.snapshot", capacity) for vs_currency in currencies
+        }
+        self.tasks = []  # Producer tasks, once elected
+
+    @property
+    def is_producer(self):
+        return self.lock.held
+
+    def poll(self):
+        for vs_currency, mailbox in self.mailboxes.items():
+            payload = mailbox.read()
+            if payload is not None:
+                message = decode(payload)
+                self.hub.publish(vs_currency, message["data"], message["fx"])
+
+    async def run(self):
+        next_election = 0.0
+        loop = asyncio.get_running_loop()
+        while not self.is_producer:
+            if loop.time() >= next_election:
+                next_election = loop.time() + ELECTION_SECONDS
+                if self.lock.try_acquire():
+                    print(f"Worker {os.getpid()} elected producer")
+                    self.poll()  # Pick up the last snapshot of the previous producer before taking over
+                    self.tasks = self.start_producer(SharedPublisher(self.hub, self.mailboxes))
+                    break
+            self.poll()
+            await asyncio.sleep(POLL_SECONDS)
+
+    def close(self):
+        for task in self.tasks:
+            task.cancel()
+        self.lock.release()
+        for mailbox in self.mailboxes.values():
+            mailbox.close()
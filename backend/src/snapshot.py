@@ -0,0 +1,172 @@
+"""
+The purpose of this file is to hold a market snapshot as aligned NumPy columns instead of a list of dicts.
+
+get_assets used to walk the asset list six or more times (uppercase, filter, diff, timestamps, suffix, rename, sort),
+building new dicts on every pass. MarketSnapshot keeps one array per field, so:
+
+1) normalization (uppercase, filter against ASSETS, None -> 0.0) is done per column
+2) currency scaling is a multiplication over the price columns, rounded() trims the result to significant digits
+3) ranking by bid is one argsort
+
+Rows only become dicts at the serialization edge, in to_records().
+"""
+
+# Imports
+import numpy as np
+
+# Float columns, in the order they appear in a record
+PRICE_FIELDS = ("bid", "ask", "spot", "change")
+FLOAT_FIELDS = PRICE_FIELDS + ("change_percentage",)
+
+# Significant digits kept in prices we compute (converted or simulated): cents on a million, and a sub-cent coin like
+# SHIB keeps its digits where rounding to 2 decimals would send 0
+PRICE_DIGITS = 8
+
+# CoinGecko /coins/markets key for each snapshot column
+COINGECKO_KEYS = {
+    "spot": "current_price",
+    "bid": "low_24h",
+    "ask": "high_24h",
+    "change": "price_change_24h",
+    "change_percentage": "price_change_percentage_24h",
+}
+
+
+class MarketSnapshot:
+    def __init__(self, name, symbol, timestamp, bid, ask, spot, change, change_percentage):
+        self.name = name  # object array
+        self.symbol = symbol  # str array
+        self.timestamp = timestamp  # int64 Unix epoch seconds
+        self.bid = bid
+        self.ask = ask
+        self.spot = spot
+        self.change = change
+        self.change_percentage = change_percentage
+
+    def __len__(self):
+        return len(self.symbol)
+
+    def columns(self):
+        return {
+            "name": self.name,
+            "symbol": self.symbol,
+            "timestamp": self.timestamp,
+            **{key: getattr(self, key) for key in FLOAT_FIELDS},
+        }
+
+    @classmethod
+    def from_columns(cls, columns):
+        return cls(**columns)
+
+    @classmethod
+    def empty(cls):
+        return cls(
+            np.empty(0, dtype=object),
+            np.empty(0, dtype=str),
+            np.empty(0, dtype=np.int64),
+            *(np.empty(0) for _ in FLOAT_FIELDS),
+        )
+
+    @classmethod
+    def from_coingecko(cls, data, to_epoch):
+        """
+        Builds a snapshot from a /coins/markets payload in one pass per column. to_epoch turns the last_updated
+        column into int64 epoch seconds. Missing or None prices become 0.0.
+        """
+        data = [d for d in data if isinstance(d, dict) and "symbol" in d]
+        if not data:
+            return cls.empty()
+
+        columns = {
+            "name": np.array([d.get("name", "Unknown") for d in data], dtype=object),
+            "symbol": np.char.upper(np.array([str(d["symbol"]) for d in data])),
+            "timestamp": to_epoch([d.get("last_updated") for d in data]),
+        }
+        for key, coingecko_key in COINGECKO_KEYS.items():
+            # dtype=float turns None into nan, which nan_to_num then zeroes
+            column = np.array([d.get(coingecko_key) for d in data], dtype=float)
+            columns[key] = np.nan_to_num(column, nan=0.0, posinf=0.0, neginf=0.0)
+        return cls.from_columns(columns)
+
+    def take(self, index):
+        """
+        Returns a new snapshot with the rows selected by a boolean mask or index array
+        """
+        return self.from_columns({key: column[index] for key, column in self.columns().items()})
+
+    def filter_symbols(self, symbols):
+        return self.take(np.isin(self.symbol, np.asarray(list(symbols))))
+
+    def scaled(self, rate, decimals=2):
+        """
+        Converts the price columns into another currency, change_percentage is unit free and stays as is. Pass
+        decimals=None to keep full precision.
+        """
+        columns = self.columns()
+        for key in PRICE_FIELDS:
+            columns[key] = columns[key] * rate
+            if decimals is not None:
+                columns[key] = np.round(columns[key], decimals)
+        return self.from_columns(columns)
+
+    def rounded(self, digits=PRICE_DIGITS):
+        """
+        Rounds the price columns to digits significant digits, so 63587.467599999996 goes out as 63587.468
+        """
+        columns = self.columns()
+        for key in PRICE_FIELDS:
+            columns[key] = round_significant(columns[key], digits)
+        return self.from_columns(columns)
+
+    def ranked_by_bid(self):
+        # Stable, so equal bids keep their input order like sorted(..., reverse=True) did
+        return self.take(np.argsort(-self.bid, kind="stable"))
+
+    @classmethod
+    def concat(cls, *snapshots):
+        return cls.from_columns(
+            {
+                key: np.concatenate([s.columns()[key] for s in snapshots])
+                for key in snapshots[0].columns()
+            }
+        )
+
+    def to_records(self, suffix=""):
+        """
+        Serialization edge: one dict per row, keys in the order the frontend has always received them
+        """
+        symbols = [f"{symbol}{suffix}" for symbol in self.symbol.tolist()]
+        return [
+            {
+                "name": name,
+                "symbol": symbol,
+                "timestamp": timestamp,
+                "bid": bid,
+                "ask": ask,
+                "spot": spot,
+                "change": change,
+                "change_percentage": change_percentage,
+            }
+            for name, symbol, timestamp, bid, ask, spot, change, change_percentage in zip(
+                self.name.tolist(),
+                symbols,
+                self.timestamp.tolist(),
+                self.bid.tolist(),
+                self.ask.tolist(),
+                self.spot.tolist(),
+                self.change.tolist(),
+                self.change_percentage.tolist(),
+            )
+        ]
+
+
+def round_significant(values, digits):
+    """
+    values rounded to digits significant digits, 0 stays 0. Rounds to an integer number of 10**-exponent and divides by
+    an exact power of ten, so the floats print as short as the digits they hold.
+    """
+    magnitude = np.floor(np.log10(np.abs(values), out=np.zeros_like(values), where=values != 0))
+    exponent = digits - 1 - magnitude  # Decimal places to keep, negative above 10**digits
+    up = 10.0 ** np.maximum(exponent, 0)
+    down = 10.0 ** np.maximum(-exponent, 0)
+    return np.round(values * up / down) / up * down
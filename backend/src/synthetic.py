@@ -0,0 +1,151 @@
+"""
+The purpose of this file is to generate realistic synthetic market data when CoinGecko cannot give us real prices.
+
+The old fallback in get_assets built each missing asset with scalar random.uniform calls, so prices jumped ±50%
+independently on every call. SyntheticMarket instead:
+
+1) starts every symbol at its baseline price from the asset registry (CAD, see assets.py)
+2) moves all symbols together with geometric Brownian motion, correlated through one common market factor
+3) ticks at a configurable rate and catches up with the wall clock in one draw per symbol, however long it was idle
+4) is reproducible from a seed, so load tests see the same market every run
+
+Set MARKET_DATA_SOURCE=synthetic in .env to serve it for every asset instead of calling CoinGecko.
+"""
+
+# Imports
+import time
+
+import numpy as np
+from snapshot import MarketSnapshot
+
+SECONDS_PER_YEAR = 365 * 24 * 3600
+
+
+class SyntheticMarket:
+    def __init__(
+        self,
+        baseline,
+        seed=None,
+        tick_seconds=1.0,
+        volatility=0.8,  # Annualized, crypto is volatile
+        drift=0.0,
+        market_correlation=0.6,  # How strongly every symbol follows the common factor
+        spread=(0.01, 0.05),  # Bid/ask distance from spot, as a fraction
+        start_time=None,
+    ):
+        # Keep only symbols with a usable numeric baseline
+        baseline = {
+            symbol: float(price)
+            for symbol, price in baseline.items()
+            if isinstance(price, (int, float))
+        }
+        self.symbols = np.array(list(baseline), dtype=str)
+        self.index = {symbol: i for i, symbol in enumerate(self.symbols.tolist())}
+        self.reference = np.array(list(baseline.values()), dtype=float)  # Previous close, change is measured against it
+        self.prices = self.reference.copy()
+
+        self.rng = np.random.default_rng(seed)
+        self.tick_seconds = tick_seconds
+        self.volatility = volatility
+        self.drift = drift
+        self.market_correlation = market_correlation
+        self.spread = spread
+        self.clock = time.time() if start_time is None else start_time  # Epoch of the latest tick
+        self.spreads = self._draw_spreads()
+
+    def extend(self, baseline):
+        """
+        Adds the symbols of baseline the market does not have yet, starting at their baseline. Symbols already in the
+        market keep their current price, so a reloaded asset file does not reset the simulation.
+        """
+        new = {
+            symbol: float(price)
+            for symbol, price in baseline.items()
+            if symbol not in self.index and isinstance(price, (int, float))
+        }
+        if not new:
+            return
+        for symbol in new:
+            self.index[symbol] = len(self.index)
+        self.symbols = np.concatenate([self.symbols, np.array(list(new))])
+        self.reference = np.concatenate([self.reference, list(new.values())])
+        self.prices = np.concatenate([self.prices, list(new.values())])
+        self.spreads = self._draw_spreads()
+
+    def _draw_spreads(self):
+        # (bid, ask) distance from spot per symbol, redrawn once per step so snapshots in between agree
+        low, high = self.spread
+        return self.rng.uniform(low, high, (2, len(self.symbols)))
+
+    def step(self, ticks=1):
+        """
+        Advances the market by ticks and returns the (ticks, symbols) price path, generated in one batch
+        """
+        dt = self.tick_seconds / SECONDS_PER_YEAR
+        market = self.rng.standard_normal((ticks, 1))
+        own = self.rng.standard_normal((ticks, len(self.symbols)))
+        rho = self.market_correlation
+        shocks = rho * market + np.sqrt(1 - rho**2) * own
+
+        # GBM log returns, accumulated over the batch
+        log_returns = (self.drift - self.volatility**2 / 2) * dt + self.volatility * np.sqrt(dt) * shocks
+        path = self.prices * np.exp(np.cumsum(log_returns, axis=0))
+
+        self.prices = path[-1]
+        self.spreads = self._draw_spreads()
+        self.clock += ticks * self.tick_seconds
+        return path
+
+    def jump(self, ticks):
+        """
+        Advances the market by ticks without generating the path in between. The sum of n independent GBM log returns
+        is one normal draw with n times the mean and variance, so the prices land exactly where step(ticks) would
+        take them (in distribution) at the cost of a single tick.
+        """
+        dt = ticks * self.tick_seconds / SECONDS_PER_YEAR
+        rho = self.market_correlation
+        shocks = rho * self.rng.standard_normal() + np.sqrt(1 - rho**2) * self.rng.standard_normal(len(self.symbols))
+        log_returns = (self.drift - self.volatility**2 / 2) * dt + self.volatility * np.sqrt(dt) * shocks
+
+        self.prices = self.prices * np.exp(log_returns)
+        self.spreads = self._draw_spreads()
+        self.clock += ticks * self.tick_seconds
+
+    def advance_to(self, now=None):
+        """
+        Moves the market to where it should be now, so callers at any rate see a consistent market. Costs the same
+        after a second or a week without a call.
+        """
+        now = time.time() if now is None else now
+        ticks = int((now - self.clock) // self.tick_seconds)
+        if ticks > 0:
+            self.jump(ticks)
+
+    def snapshot(self, symbols=None):
+        """
+        Returns the current market as a MarketSnapshot in CAD, optionally only for symbols. Does not advance the
+        market, so every caller between two ticks sees the same prices.
+        """
+        rows = np.arange(len(self.symbols))
+        if symbols is not None:
+            rows = np.array([self.index[s] for s in symbols if s in self.index], dtype=int)
+
+        spot = self.prices[rows]
+        bid = spot * (1 - self.spreads[0, rows])  # Bid is slightly lower than spot
+        ask = spot * (1 + self.spreads[1, rows])  # Ask is slightly higher than spot
+        change = spot - self.reference[rows]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            change_percentage = np.where(
+                self.reference[rows] != 0, change / self.reference[rows] * 100, 0.0
+            )
+
+        return MarketSnapshot(
+            name=self.symbols[rows].astype(object),
+            symbol=self.symbols[rows],
+            timestamp=np.full(len(rows), int(self.clock), dtype=np.int64),
+            bid=bid,
+            ask=ask,
+            spot=spot,
+            change=change,
+            change_percentage=np.round(change_percentage, 2),
+        )
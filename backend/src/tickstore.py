@@ -0,0 +1,314 @@
+"""
+The purpose of this file is to keep a price history so we can chart prices without scraping our own WebSocket.
+
+Every snapshot the producers fetch is appended as one (timestamp, spot, bid, ask) tick per symbol into a fixed-width
+ring per symbol, memory-mapped with NumPy:
+
+1) history survives restarts, the files live in TICK_STORE_DIR (backend/data/ticks by default)
+2) memory and disk stay bounded, each ring holds TICK_RETENTION_SECONDS worth of ticks and then overwrites the oldest
+3) reading a time range returns views straight into the mapped file, nothing is copied
+4) all the rings of a vs_currency share one file and one mapping, so the open file descriptors do not grow with the
+asset list (one ring file per symbol ran into the default ulimit -n of 1024)
+
+File layout (RingTable): HEADER (magic, capacity, max_slots, used as int64), then max_slots slot entries
+(symbol, count and, for tables created with pending=True, one record not in the ring yet such as an open candle), then
+one ring of capacity records per slot in use. A symbol gets the next free slot the first time it
+is appended and the file grows by GROW_SLOTS rings at a time, so a new symbol never moves existing data. count is the
+total number of records ever appended to a ring, so its oldest record sits at count % capacity once the ring is full.
+
+Only the producer writes. Other workers open the same files with readonly=True: mapped read-only, never created,
+truncated or resized, and remapped when the writer grew or replaced the file. The file is only ever extended in place
+or swapped with os.replace, so a reader's mapping never loses the pages under it.
+"""
+
+# Imports
+import math
+import mmap
+import os
+import re
+from pathlib import Path
+
+import numpy as np
+
+MAGIC = 0x4C425452  # "RTBL"
+HEADER_DTYPE = np.dtype("<i8")
+HEADER_FIELDS = 4  # magic, capacity, max_slots, used
+HEADER_BYTES = HEADER_FIELDS * HEADER_DTYPE.itemsize
+
+SYMBOL_DTYPE = np.dtype("S32")
+MAX_SLOTS = 4096  # Symbols per file, the slot table is sparse on disk until used
+GROW_SLOTS = 64  # Rings added to the file at a time
+
+TICK_DTYPE = np.dtype(
+    [("timestamp", "<i8"), ("spot", "<f8"), ("bid", "<f8"), ("ask", "<f8")]
+)
+
+
+class RingTable:
+    """
+    One memory-mapped ring of fixed-width records per symbol, all in a single file
+    """
+
+    def __init__(self, path, capacity, dtype=TICK_DTYPE, max_slots=MAX_SLOTS, pending=False, readonly=False):
+        self.path = Path(path)
+        self.dtype = dtype
+        self.slot_dtype = slot_dtype(dtype, pending)
+        self.capacity = capacity
+        self.max_slots = max_slots
+        self.readonly = readonly
+        self.stamp = None  # (st_ino, st_size) of the file mapped read-only
+        self.mapping = self.header = self.table = self.records = None
+        self.slots = {}  # symbol : slot index
+        if readonly:
+            self._follow()
+            return
+
+        existing = None
+        if self.path.exists():
+            existing = np.fromfile(self.path, dtype=HEADER_DTYPE, count=HEADER_FIELDS)
+        if existing is None or len(existing) < HEADER_FIELDS or existing[0] != MAGIC:
+            self._create()  # New, or not one of ours: start again
+        elif existing[1] != capacity:
+            self._resize(int(existing[1]), int(existing[2]))  # Keep the newest records when the retention changed
+            return
+        self._map()
+
+    def _create(self):
+        """
+        Writes an empty table next to path and renames it over, so nobody ever maps half a header
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = self.path.with_name(self.path.name + ".tmp")
+        with open(temporary, "wb") as f:
+            f.truncate(HEADER_BYTES + self.max_slots * self.slot_dtype.itemsize)
+            f.write(np.array([MAGIC, self.capacity, self.max_slots, 0], dtype=HEADER_DTYPE).tobytes())
+        os.replace(temporary, self.path)
+
+    def _resize(self, old_capacity, max_slots):
+        old = RingTable(self.path, old_capacity, self.dtype, max_slots, self.has_pending)
+        rows = {symbol: np.concatenate(old.segments(symbol)) for symbol in old.slots}
+        pending = {symbol: old.pending(symbol) for symbol in old.slots} if self.has_pending else {}
+        old.close()
+        self.max_slots = max_slots
+        self._create()
+        self._map()
+        for symbol, records in rows.items():
+            self.append(symbol, records)
+        for symbol, record in pending.items():
+            self.set_pending(symbol, record)
+
+    @property
+    def has_pending(self):
+        return "pending" in self.slot_dtype.names
+
+    def _map(self):
+        """
+        Maps the whole file once and takes the header, slot table and rings as views of that one mapping
+        """
+        if self.readonly:
+            with open(self.path, "rb") as f:
+                self.mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            with open(self.path, "r+b") as f:
+                self.mapping = mmap.mmap(f.fileno(), 0)
+        self.header = np.frombuffer(self.mapping, HEADER_DTYPE, HEADER_FIELDS)
+        if self.header[0] != MAGIC:
+            self.close()  # Only reachable read-only, the writer recreates a file that is not one of ours
+            return
+        self.capacity = int(self.header[1])
+        self.max_slots = int(self.header[2])
+        self.table = np.frombuffer(self.mapping, self.slot_dtype, self.max_slots, HEADER_BYTES)
+
+        offset = HEADER_BYTES + self.max_slots * self.slot_dtype.itemsize
+        rings = (len(self.mapping) - offset) // (self.capacity * self.dtype.itemsize)
+        self.records = np.frombuffer(self.mapping, self.dtype, rings * self.capacity, offset).reshape(
+            rings, self.capacity
+        )
+        self._index()
+
+    def _index(self):
+        used = int(self.header[3])
+        self.slots = {symbol.decode(): index for index, symbol in enumerate(self.table["symbol"][:used].tolist())}
+
+    def _follow(self):
+        """
+        Read-only tables catch up with the writer: remap when the file grew or was replaced, pick up new symbols, and
+        hold nothing while there is no file yet
+        """
+        try:
+            stat = os.stat(self.path)
+            stamp = (stat.st_ino, stat.st_size)
+        except FileNotFoundError:
+            stamp = None
+        if stamp != self.stamp:
+            self.close()
+            self.stamp = stamp
+            if stamp is not None and stamp[1] >= HEADER_BYTES:
+                self._map()
+        elif self.header is not None and int(self.header[3]) != len(self.slots):
+            self._index()
+
+    def _grow(self):
+        """
+        Adds GROW_SLOTS rings at the end of the file. Views handed out before keep the old mapping alive until dropped.
+        """
+        with open(self.path, "r+b") as f:
+            f.truncate(len(self.mapping) + GROW_SLOTS * self.capacity * self.dtype.itemsize)
+        self._map()
+
+    def slot(self, symbol):
+        """
+        Index of the ring of symbol, handing out the next free one the first time
+        """
+        if self.readonly:
+            raise ValueError(f"{self.path} is open read-only")
+        index = self.slots.get(symbol)
+        if index is not None:
+            return index
+
+        name = symbol.encode()
+        index = int(self.header[3])
+        if len(name) > SYMBOL_DTYPE.itemsize:
+            raise ValueError(f"Symbol {symbol!r} is longer than {SYMBOL_DTYPE.itemsize} bytes")
+        if index >= self.max_slots:
+            raise ValueError(f"{self.path} already holds {self.max_slots} symbols")
+        if index >= len(self.records):
+            self._grow()
+        self.table[index] = np.zeros((), self.slot_dtype)  # Clears the count and pending record
+        self.table["symbol"][index] = name
+        self.header[3] = index + 1  # Count the slot last, readers never see it half written
+        self.slots[symbol] = index
+        return index
+
+    def __len__(self):
+        return len(self.slots)
+
+    def append(self, symbol, rows):
+        """
+        Appends records (a structured array of dtype) to the ring of symbol, overwriting its oldest once it is full
+        """
+        index = self.slot(symbol)
+        ring = self.records[index]
+        count = int(self.table["count"][index])
+        rows = rows[-self.capacity :]
+        start = count % self.capacity
+        first = min(len(rows), self.capacity - start)
+        ring[start : start + first] = rows[:first]
+        ring[: len(rows) - first] = rows[first:]
+        # Bump the count last, so a crash mid-write never exposes half written rows
+        self.table["count"][index] = count + len(rows)
+
+    def pending(self, symbol):
+        """
+        A copy of the pending record of symbol, None if the symbol has no slot (all zeros until one was set)
+        """
+        if self.readonly:
+            self._follow()
+        index = self.slots.get(symbol)
+        return None if index is None else self.table["pending"][index].copy()
+
+    def set_pending(self, symbol, record):
+        self.table["pending"][self.slot(symbol)] = record
+
+    def segments(self, symbol):
+        """
+        The stored records of symbol in chronological order, as at most two views into the mapped file
+        """
+        if self.readonly:
+            self._follow()
+        index = self.slots.get(symbol)
+        if index is None:
+            return []
+        ring = self.records[index]
+        count = int(self.table["count"][index])
+        if count <= self.capacity:
+            return [ring[:count]]
+        head = count % self.capacity
+        return [ring[head:], ring[:head]]
+
+    def read(self, symbol, start=None, end=None, key="timestamp"):
+        """
+        Records of symbol with start <= key < end as zero-copy views (one, or two when the range wraps around the ring)
+        """
+        views = []
+        for segment in self.segments(symbol):
+            column = segment[key]
+            lo = 0 if start is None else np.searchsorted(column, start, side="left")
+            hi = len(column) if end is None else np.searchsorted(column, end, side="left")
+            if hi > lo:
+                views.append(segment[lo:hi])
+        return views
+
+    def flush(self):
+        if self.mapping is not None and not self.readonly:
+            self.mapping.flush()
+
+    def close(self):
+        """
+        Drops the mapping, it is unmapped once the views handed out are gone too
+        """
+        self.mapping = self.header = self.table = self.records = None
+        self.slots = {}
+
+
+def slot_dtype(dtype, pending=False):
+    """
+    One entry of the slot table: the symbol, the records ever appended to its ring and optionally one pending record
+    """
+    fields = [("symbol", SYMBOL_DTYPE), ("count", "<i8")]
+    return np.dtype(fields + [("pending", dtype)] if pending else fields)
+
+
+def safe_name(name):
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", name)
+
+
+class TickStore:
+    """
+    One RingTable per vs_currency, opened lazily on the first tick. readonly for workers that only read the producer's
+    history.
+    """
+
+    def __init__(self, directory, retention_seconds, tick_interval, readonly=False):
+        self.directory = Path(directory)
+        self.retention_seconds = retention_seconds
+        # Producers never tick faster than tick_interval, so this many slots always cover the retention window
+        self.capacity = max(1, math.ceil(retention_seconds / tick_interval))
+        self.tables = {}  # vs_currency : RingTable
+        self.readonly = readonly
+
+    def _path(self, vs_currency):
+        return self.directory / f"{safe_name(vs_currency)}.ticks"
+
+    def table(self, vs_currency):
+        if vs_currency not in self.tables:
+            self.tables[vs_currency] = RingTable(self._path(vs_currency), self.capacity, readonly=self.readonly)
+        return self.tables[vs_currency]
+
+    def writable(self):
+        """
+        Reopens the tables read-write, once this worker is elected producer
+        """
+        self.tables = {}
+        self.readonly = False
+
+    def record(self, vs_currency, assets, timestamp):
+        """
+        Appends one tick per asset of a snapshot, all stamped with the time it was fetched
+        """
+        table = self.table(vs_currency)
+        rows = np.array([(timestamp, asset["spot"], asset["bid"], asset["ask"]) for asset in assets], dtype=TICK_DTYPE)
+        for i, asset in enumerate(assets):
+            table.append(asset["symbol"], rows[i : i + 1])
+
+    def read(self, vs_currency, symbol, start=None, end=None):
+        """
+        Ticks of symbol with start <= timestamp < end, as zero-copy views. Unknown symbols have no history.
+        """
+        if vs_currency not in self.tables and not self._path(vs_currency).exists():
+            return []
+        return self.table(vs_currency).read(symbol, start, end)
+
+    def flush(self):
+        for table in self.tables.values():
+            table.flush()
@@ -0,0 +1,163 @@
+"""
+The purpose of this file is to show where the time of one slow tick went: the upstream fetch, the transform, encoding
+or the per-client sends.
+
+A sampled tick gets a trace. Every stage along fetch -> transform -> derive -> publish -> encode -> send wraps itself
+in span(), and each finished span is exported right away, either as one JSON line per span (TRACE_EXPORT=log) or as
+Chrome trace events appended to TRACE_FILE (open it in chrome://tracing or https://ui.perfetto.dev).
+
+TRACE_SAMPLE_RATE is the fraction of ticks traced (0, the default, turns tracing off). api.py configures the tracer
+once it has loaded .env. An unsampled tick costs one
+context variable lookup per stage. Sends happen in each client's task, they find the trace on the Tick itself. A trace
+records at most MAX_SPANS_PER_TRACE spans, so a tick fanned out to thousands of clients stays cheap to trace.
+"""
+
+# Imports
+import contextvars
+import itertools
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from encoding import encode
+
+MAX_SPANS_PER_TRACE = 200
+
+_trace_ids = itertools.count(1)
+_current = contextvars.ContextVar("trace", default=None)
+
+
+class Trace:
+    def __init__(self, name):
+        self.id = next(_trace_ids)
+        self.name = name
+        self.spans = 0
+
+
+class NullSpan:
+    """
+    Returned by span() when the tick is not sampled, so callers never need to check
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attributes):
+        pass
+
+
+NULL_SPAN = NullSpan()
+
+
+class Span:
+    def __init__(self, tracer, trace, name, attributes):
+        self.tracer = tracer
+        self.trace = trace
+        self.name = name
+        self.attributes = attributes
+
+    def __enter__(self):
+        self.start = time.time()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        duration = time.perf_counter() - self.started
+        if exc_type is not None:
+            self.attributes["error"] = exc_type.__name__
+        self.tracer.export(self, duration)
+        return False
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+
+class Tracer:
+    def __init__(self, sample_rate=0.0, export="log", path=None):
+        self.sample_rate = sample_rate
+        self.export_to = export
+        self.path = path
+        self._file = None
+        self._lock = threading.Lock()  # Spans can end in worker threads (asyncio.to_thread)
+
+    def configure(self, sample_rate, export, path):
+        with self._lock:
+            self.sample_rate = sample_rate
+            self.export_to = export
+            self.path = path
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    @contextmanager
+    def trace(self, name):
+        """
+        Starts a trace for one tick if it is sampled, the stages below pick it up through span()
+        """
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            yield None
+            return
+        trace = Trace(name)
+        token = _current.set(trace)
+        try:
+            with self.span(name, trace):
+                yield trace
+        finally:
+            _current.reset(token)
+
+    def span(self, name, trace=None, **attributes):
+        trace = trace or _current.get()
+        if trace is None or trace.spans >= MAX_SPANS_PER_TRACE:
+            return NULL_SPAN
+        trace.spans += 1
+        return Span(self, trace, name, attributes)
+
+    def export(self, span, duration):
+        if self.export_to == "file" and self.path:
+            # Chrome trace "complete" events. The JSON array format may be left unterminated, so appending is enough
+            event = {
+                "name": span.name,
+                "cat": span.trace.name,
+                "ph": "X",
+                "ts": span.start * 1e6,
+                "dur": duration * 1e6,
+                "pid": os.getpid(),
+                "tid": span.trace.id,
+                "args": span.attributes,
+            }
+            with self._lock:
+                if self._file is None:
+                    new = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+                    self._file = open(self.path, "a", buffering=1)
+                    if new:
+                        self._file.write("[\n")
+                self._file.write(encode(event) + ",\n")
+        else:
+            record = {
+                "trace": span.trace.id,
+                "span": span.name,
+                "start": round(span.start, 6),
+                "ms": round(duration * 1000, 3),
+                **span.attributes,
+            }
+            print(encode(record))
+
+
+# Off until api.py configures it from .env
+tracer = Tracer()
+
+
+def span(name, trace=None, **attributes):
+    """
+    Times a stage of the current (or the given) trace, a no-op when the tick is not sampled
+    """
+    return tracer.span(name, trace, **attributes)
+
+
+def current_trace():
+    return _current.get()
@@ -0,0 +1,100 @@
+"""
+The purpose of this file is to provide the binary wire formats a client can pick with the "format" option of the
+subscribe event on the crypto_listings/markets/ws endpoint. JSON text stays the default.
+
+1) "json": compact JSON text frames (see encoding.py)
+2) "msgpack": the same messages as JSON, packed with MessagePack into binary frames
+3) "packed": fixed-layout little-endian records, no key names on the wire at all
+
+Packed frames all start with HEADER = kind (uint8), row count (uint32), removed count (uint32):
+
+- KIND_SYMBOLS: the symbol table, sent before the first data frame and again whenever it grows. Each entry is
+  symbol length (uint8) + UTF-8 symbol + name length (uint8) + UTF-8 name, an entry's position is its index.
+- KIND_SNAPSHOT / KIND_DELTA: row count ROW_DTYPE records (symbol index uint16, timestamp int64 then bid, ask, spot,
+  change, change_percentage float64, 50 bytes each), followed by removed count symbol indexes (uint16).
+"""
+
+# Imports
+import struct
+
+import numpy as np
+
+try:
+    import msgpack  # Optional, only needed by clients that ask for "msgpack"
+except ImportError:
+    msgpack = None
+
+FORMATS = ("json", "msgpack", "packed")
+
+HEADER = struct.Struct("<BII")
+KIND_SYMBOLS = 0
+KIND_SNAPSHOT = 1
+KIND_DELTA = 2
+
+# Packed (unaligned) record, matches the key order of a JSON row
+ROW_DTYPE = np.dtype(
+    [
+        ("symbol", "<u2"),
+        ("timestamp", "<i8"),
+        ("bid", "<f8"),
+        ("ask", "<f8"),
+        ("spot", "<f8"),
+        ("change", "<f8"),
+        ("change_percentage", "<f8"),
+    ]
+)
+
+
+class SymbolTable:
+    """
+    Append-only symbol : index table shared by every packed client, so an index never changes meaning
+    """
+
+    def __init__(self):
+        self.index = {}  # symbol : position
+        self.names = []  # (symbol, name) in position order
+        self._encoded = None  # Cached KIND_SYMBOLS frame for the current version
+
+    @property
+    def version(self):
+        return len(self.names)
+
+    def lookup(self, symbol, name=None):
+        position = self.index.get(symbol)
+        if position is None:
+            position = self.index[symbol] = len(self.names)
+            self.names.append((symbol, name or symbol))
+            self._encoded = None
+        return position
+
+    def encode(self):
+        if self._encoded is None:
+            body = bytearray(HEADER.pack(KIND_SYMBOLS, len(self.names), 0))
+            for symbol, name in self.names:
+                for text in (symbol, name):
+                    raw = str(text).encode()[:255]
+                    body += bytes([len(raw)]) + raw
+            self._encoded = bytes(body)
+        return self._encoded
+
+
+def pack_rows(kind, rows, symbol_table, removed=()):
+    """
+    Packs JSON-shaped rows (and removed symbols, for deltas) into one packed frame
+    """
+    records = np.zeros(len(rows), dtype=ROW_DTYPE)
+    records["symbol"] = [symbol_table.lookup(row["symbol"], row.get("name")) for row in rows]
+    for key in ROW_DTYPE.names[1:]:
+        records[key] = [row[key] for row in rows]
+    removed_positions = np.array([symbol_table.lookup(s) for s in removed], dtype="<u2")
+
+    return (
+        HEADER.pack(kind, len(records), len(removed_positions))
+        + records.tobytes()
+        + removed_positions.tobytes()
+    )
+
+
+def pack_msgpack(message):
+    return msgpack.packb(message, use_bin_type=True)
+
@@ -4,6 +4,7 @@ const messages = document.getElementById("messages");
 const subscribebtn = document.getElementById("subscribebtn");
 let statusMessage = document.getElementById("statusMessageOpen");
 let ws;
+let assets = {};  // symbol : asset, kept up to date from snapshots and deltas
 
 function initializeWebSocket() {
     ws = new WebSocket("ws://localhost:8000/crypto_listings/markets/ws");
@@ -16,7 +17,17 @@ function initializeWebSocket() {
 
     ws.onmessage = function(event) {
         const parsedData = JSON.parse(event.data);
-        messages.textContent = JSON.stringify(parsedData, null, 4);  // Make the data in JSON format look pretty
+
+        if (parsedData.event === "data") {
+            // Full snapshot, start again from scratch
+            assets = {};
+        }
+        parsedData.data.forEach(asset => { assets[asset.symbol] = asset; });
+        (parsedData.removed || []).forEach(symbol => { delete assets[symbol]; });
+
+        // Show the merged assets sorted by bid descending, same as the server
+        const sortedAssets = Object.values(assets).sort((a, b) => b.bid - a.bid);
+        messages.textContent = JSON.stringify(sortedAssets, null, 4);  // Make the data in JSON format look pretty
     };
 
     ws.onclose = function() {
@@ -51,7 +62,9 @@ function subscribe() {
     if (ws.readyState === WebSocket.OPEN) {
         const subscriptionMessage = {
             event: "subscribe",
-            channel: "rates"
+            channel: "rates",
+            vs_currency: currency,
+            mode: "delta"  // Full snapshot first, then only the assets that changed
         };
         console.log("Subscription message:", subscriptionMessage);  // Log the subscription message to check received
         ws.send(JSON.stringify(subscriptionMessage));